@@ -1,4 +1,20 @@
+from bisect import bisect_left
 from enum import Enum
+import os
+import time
+
+from compound import factors
+from currency import BASE, RateTable, UnknownCurrency
+from history import HistoryStore, TransactionHistory
+from idempotency import IdempotencyCache
+from integrity import Checksums
+from ledger import EventKind, Ledger
+from lots import LotBook, LotPolicy
+from scheduler import Scheduler, StandingOrder
+from ranking import BalanceIndex
+from search import AccountIndex
+from snapshot import Snapshot
+from velocity import LimitExceeded, VelocityLimit
 
 
 # olika kontotyper behöver olika fält, programflöde bestäms av kontots "type"
@@ -20,32 +36,76 @@ class Account:
 
     fields: dict
 
-    def __init__(self, name: str, type: AccountType, fields: dict = None):
+    def __init__(
+        self, name: str, type: AccountType, fields: dict = None, currency: str = BASE
+    ):
         self.name = name
         self.type = type
         self.balance = 0.0
         self.fields = fields or {}
 
+        # valutan som saldot och alla belopp på kontot är i
+        self.currency = currency
+
+        # sätts när kontot registreras hos en bank
+        self.history: TransactionHistory | None = None
+
+        # anropas med (konto, ändringar) när banken ändrar kontot
+        self.listeners: list = []
+
+        # simulerad månad som kontot senast uppdaterats till, se Bank.lazy_accrual
+        self.accrued_month = 0
+
+        # bankens version när kontot senast ändrades, se Bank.snapshot
+        self.version = 0
+
+        # kundnummer för kunden som äger kontot
+        self.customer: int | None = None
+
+    def copy(self) -> "Account":
+        """Kopia av kontots tillstånd, utan historik och lyssnare."""
+        fields = dict(self.fields)
+        if "lots" in fields:
+            fields["lots"] = fields["lots"].copy()
+
+        account = Account(self.name, self.type, fields, self.currency)
+        account.balance = self.balance
+        account.number = self.number
+        account.accrued_month = self.accrued_month
+        account.version = self.version
+        account.customer = self.customer
+        return account
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
     # statiska fabriksmetoder
     # t.ex. Account.new_savings("Mitt sparkonto", 0.02)
 
     @staticmethod
-    def new_checking(name: str):
+    def new_checking(name: str, currency: str = BASE):
         """Skapa ett användarkonto. Användarkonton har vanligtvis ingen ränta."""
-        return Account(name, AccountType.CHECKING)
+        return Account(name, AccountType.CHECKING, currency=currency)
 
     @staticmethod
-    def new_savings(name: str, interest: float):
+    def new_savings(name: str, interest: float, currency: str = BASE):
         """Skapa ett sparkonto med fast årlig ränta."""
-        return Account(name, AccountType.SAVINGS, {"interest": interest})
+        return Account(name, AccountType.SAVINGS, {"interest": interest}, currency)
 
     @staticmethod
-    def new_isk(name: str, return_rate: float, standardized_tax: float):
+    def new_isk(
+        name: str, return_rate: float, standardized_tax: float, currency: str = BASE
+    ):
         """Skapa ett investeringssparkonto.
 
         Args:
             return_rate (float): Förenklad årlig avkastning. I verkligheten beror den på marknaden och värdeförändringar på aktier och fonder.
             standardized_tax (float): Årlig schablonskatt.
+            currency (str): Kontots valuta.
         """
         return Account(
             name,
@@ -53,19 +113,33 @@ class Account:
             {
                 "return_rate": return_rate,
                 "standardized_tax": standardized_tax,
-                # startkapital och summan av årets transaktioner, används vid beräkning av schablonskatt
+                # startkapital och summan av årets transaktioner
                 "starting_balance": 0.0,
                 "yearly_transactions": 0.0,
+                # underlag för schablonskatt: summan av årets ingående
+                # kvartalssaldon, antal registrerade kvartal och årets insättningar
+                "quarter_balances": 0.0,
+                "quarters": 0,
+                "yearly_deposits": 0.0,
             },
+            currency,
         )
 
     @staticmethod
-    def new_af(name: str, return_rate: float, tax_rate: float):
+    def new_af(
+        name: str,
+        return_rate: float,
+        tax_rate: float,
+        lot_policy: LotPolicy = LotPolicy.FIFO,
+        currency: str = BASE,
+    ):
         """Skapa ett aktie- och fondkonto.
 
         Args:
             return_rate (float): Förenklad årlig avkastning. I verkligheten beror den på marknaden och värdeförändringar på aktier och fonder.
             tax_rate (float): Vinstskatt (runt 30%).
+            lot_policy (LotPolicy): Hur anskaffningsvärdet beräknas vid uttag.
+            currency (str): Kontots valuta.
         """
         return Account(
             name,
@@ -73,12 +147,67 @@ class Account:
             {
                 "return_rate": return_rate,
                 "capital_gains_tax": tax_rate,
-                # håll koll på vinsten
+                # håll koll på vinsten, orealiserad och realiserad
                 "capital_gains": 0.0,
+                "realized_gains": 0.0,
+                # insättningar och avkastning per post
+                "lots": LotBook(lot_policy),
             },
+            currency,
         )
 
+    def withdrawal_tax(self, amount: float) -> float:
+        """Skatten som dras utöver amount vid ett uttag, bara för AF.
+
+        Skatten tas också från posterna, så den är skattesatsen gånger
+        vinsten i amount + skatten. Löses genom att räkna om tills skatten
+        inte ändras, vinsten växer långsammare än beloppet så det går fort.
+        """
+        if self.type != AccountType.AF:
+            return 0.0
+
+        lots: LotBook = self.fields["lots"]
+        rate = self.fields["capital_gains_tax"]
+
+        tax = 0.0
+        for _ in range(100):
+            new = max(0.0, lots.gains(amount + tax)) * rate
+            if abs(new - tax) < 1e-12:
+                break
+            tax = new
+
+        # avrundningsrest när hela tillgängliga saldot tas ut, annars blir
+        # kontot aldrig tomt och kan inte stängas
+        rest = self.balance - amount - new
+        if 0.0 <= rest < 1e-6:
+            new += rest
+
+        return new
+
+    def available(self) -> float:
+        """Största belopp som kan tas ut, för AF räcker resten till skatten."""
+        if self.type != AccountType.AF:
+            return self.balance
+
+        # amount + skatt växer med amount, sök största amount som får plats
+        low, high = 0.0, self.balance
+        for _ in range(100):
+            middle = (low + high) / 2.0
+            if middle + self.withdrawal_tax(middle) <= self.balance:
+                low = middle
+            else:
+                high = middle
+            if high - low < 1e-9:
+                break
+
+        return low
+
     def withdraw(self, amount: float) -> bool:
+        """Ta ut amount, för AF dras skatten på vinsten utöver amount.
+
+        Returnerar False och ändrar ingenting om saldot inte räcker till
+        beloppet och skatten.
+        """
         if amount > self.balance:
             return False
 
@@ -94,35 +223,60 @@ class Account:
                 self.balance -= amount
 
             case AccountType.AF:
-                # beräkna andel av uttaget som är vinst
-                capital_ratio = self.fields["capital_gains"] / self.balance
-                capital_gains_withdrawn = amount * capital_ratio
-                tax = capital_gains_withdrawn * self.fields["capital_gains_tax"]
+                lots: LotBook = self.fields["lots"]
+
+                # skatt på vinsten i de poster som uttaget förbrukar, räknas
+                # innan något ändras så att ett för stort uttag inte rör posterna
+                tax = self.withdrawal_tax(amount)
+                if amount + tax > self.balance:
+                    return False
+
+                # skatten dras också från posterna
+                lots.consume(amount + tax)
 
                 # dra saldo och skatt
                 self.balance -= amount + tax
-                self.fields["capital_gains"] -= capital_gains_withdrawn
+                self.fields["capital_gains"] = lots.unrealized_gains
+                self.fields["realized_gains"] = lots.realized_gains
         return True
 
     def deposit(self, amount):
-        if self.type == AccountType.ISK:
-            self.fields["yearly_transactions"] += amount
+        match self.type:
+            case AccountType.ISK:
+                self.fields["yearly_transactions"] += amount
+                self.fields["yearly_deposits"] += amount
+
+            case AccountType.AF:
+                # insättningar har anskaffningsvärdet lika med beloppet
+                self.fields["lots"].add(amount, amount)
+                self.fields["capital_gains"] = self.fields["lots"].unrealized_gains
 
         self.balance += amount
 
+    def apply_quarterly_update(self):
+        """Registrera kvartalets ingående saldo, används för ISK:s schablonskatt."""
+        if self.type == AccountType.ISK and self.fields["quarters"] < 4:
+            self.fields["quarter_balances"] += self.balance
+            self.fields["quarters"] += 1
+
     def apply_yearly_update(self):
         match self.type:
             case AccountType.SAVINGS:
                 self.balance *= 1.0 + self.fields["interest"]
 
             case AccountType.ISK:
+                # kvartal som inte registrerats räknas med nuvarande saldo
+                quarter_balances = (
+                    self.fields["quarter_balances"]
+                    + (4 - self.fields["quarters"]) * self.balance
+                )
+
                 self.balance *= 1.0 + self.fields["return_rate"]
 
-                # schablonskatt
+                # schablonskatt, kapitalunderlaget är en fjärdedel av summan av
+                # kvartalens ingående saldon och årets insättningar
 
-                capital_base = (
-                    self.fields["starting_balance"] + self.balance
-                ) / 2.0 + self.fields["yearly_transactions"]
+                capital_base = (quarter_balances + self.fields["yearly_deposits"]) / 4.0
 
                 tax = capital_base * self.fields["standardized_tax"]
 
@@ -131,38 +285,920 @@ class Account:
                 # återställ inför nästa år
                 self.fields["starting_balance"] = self.balance
                 self.fields["yearly_transactions"] = 0.0
+                self.fields["quarter_balances"] = 0.0
+                self.fields["quarters"] = 0
+                self.fields["yearly_deposits"] = 0.0
 
             case AccountType.AF:
                 gains = self.balance * self.fields["return_rate"]
                 self.balance += gains
-                self.fields["capital_gains"] += gains
+
+                # årets avkastning blir en egen post utan anskaffningsvärde
+                self.fields["lots"].add(gains, 0.0)
+                self.fields["capital_gains"] = self.fields["lots"].unrealized_gains
+
+    def apply_yearly_updates(self, years: int):
+        """Samma som years anrop till apply_yearly_update utan transaktioner emellan.
+
+        Första året räknas som vanligt, resten i sluten form eftersom saldot
+        då är detsamma under hela året.
+        """
+        if years <= 0:
+            return
+
+        self.apply_yearly_update()
+        years -= 1
+
+        if not years:
+            return
+
+        match self.type:
+            case AccountType.SAVINGS:
+                self.balance *= factors.get(self.fields["interest"], 0.0, years)
+
+            case AccountType.ISK:
+                # alla kvartal har samma saldo och inga insättningar görs, så
+                # kapitalunderlaget är saldot vid årets början
+                self.balance *= factors.get(
+                    self.fields["return_rate"], self.fields["standardized_tax"], years
+                )
+                self.fields["starting_balance"] = self.balance
+
+            case AccountType.AF:
+                gains = self.balance * (
+                    factors.get(self.fields["return_rate"], 0.0, years) - 1.0
+                )
+                self.balance += gains
+
+                self.fields["lots"].add(gains, 0.0)
+                self.fields["capital_gains"] = self.fields["lots"].unrealized_gains
+
+    def accrue_to(self, month: int):
+        """Kör kvartals- och årsuppdateringar som skett sedan accrued_month fram till month.
+
+        Ett årsskifte sker i månader delbara med 12 och ett kvartal börjar i
+        månader delbara med 3, årsuppdateringen görs före kvartalet.
+        """
+        start = self.accrued_month
+        if month <= start:
+            return
+
+        year_ends = month // 12 - start // 12
+
+        if year_ends == 0:
+            for _ in range(month // 3 - start // 3):
+                self.apply_quarterly_update()
+        else:
+            # kvartal som återstår av innevarande år
+            first_year_end = (start // 12 + 1) * 12
+            for _ in range(first_year_end // 3 - 1 - start // 3):
+                self.apply_quarterly_update()
+
+            self.apply_yearly_updates(year_ends)
+
+            # kvartal sedan det senaste årsskiftet, inklusive det första
+            last_year_end = month // 12 * 12
+            for _ in range(month // 3 - last_year_end // 3 + 1):
+                self.apply_quarterly_update()
+
+        self.accrued_month = month
+
+
+class Customer:
+    """En kund och kundens konton, så att frågor om en kund inte går igenom hela banken."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+        # sätts när kunden registreras hos en bank
+        self.number: int | None = None
+
+        # key=kontonummer
+        self.accounts: dict[int, Account] = {}
+        # sökindex över kundens konton
+        self.index = AccountIndex()
+        # kundens konton sorterade efter saldo
+        self.ranking = BalanceIndex()
+
+        # key=valuta, summan av kontonas saldon, uppdateras av banken vid
+        # varje ändring
+        self.totals: dict[str, float] = {}
 
 
 class Bank:
-    def __init__(self):
+    def __init__(
+        self,
+        ledger: Ledger | None = None,
+        history_window: int = 1000,
+        history_dir: str | None = None,
+        lazy_accrual: bool = False,
+        rates: RateTable | None = None,
+    ):
         # key=kontonummer
         self.accounts: dict[int, Account] = {}
         self.account_number: int = 1
 
-    def register_account(self, account: Account):
+        # händelsebaserat läge, alla förändringar av saldon loggas i huvudboken
+        self.ledger = ledger
+
+        # antal transaktioner per konto som hålls i minnet, äldre skrivs till
+        # history_dir (eller en temporär fil om den inte är satt). alla konton
+        # delar en fil, så antalet öppna filer beror inte på antalet konton
+        self.history_window = history_window
+        self.history_dir = history_dir
+        self.history_store = HistoryStore(
+            os.path.join(history_dir, "history.hist") if history_dir else None
+        )
+
+        # key=kontotyp, kontona uppdelade per typ för svep över en typ
+        self.accounts_by_type: dict[AccountType, dict[int, Account]] = {
+            type: {} for type in AccountType
+        }
+
+        # sökindex över kontonamn och kontonummer
+        self.index = AccountIndex()
+
+        # konton sorterade efter saldo i basvalutan, se ranking_for
+        self.ranking: BalanceIndex | None = BalanceIndex()
+        # key=kundnummer (None för hela banken), månaden som indexet senast
+        # räknades upp till vid lazy_accrual
+        self.ranked_months: dict[int | None, int] = {}
+
+        # key=kundnummer
+        self.customers: dict[int, Customer] = {}
+        self.customer_number: int = 1
+        # sökindex över kundnamn och kundnummer
+        self.customer_index = AccountIndex()
+
+        # anropas med (konto, ändringar) när något konto ändras, öppnas eller stängs
+        self.listeners: list = []
+
+        # simulerad tid i månader, ett år börjar i varje månad delbar med 12
+        self.month = 0
+
+        # uppdatera bara konton när de läses eller ändras istället för att gå
+        # igenom alla konton när klockan flyttas fram
+        self.lazy_accrual = lazy_accrual
+
+        # stående överföringar, görs när klockan flyttas fram
+        self.scheduler = Scheduler()
+
+        # nycklar för genomförda transaktioner, se deposit/withdraw/transfer
+        self.idempotency = IdempotencyCache()
+
+        # valutakurser för överföringar mellan valutor och totaler, utan
+        # tabell finns bara basvalutan
+        self.rates = rates or RateTable()
+
+        # kontrollsummor över saldon och fält, se verify och audit
+        self.integrity: Checksums | None = Checksums()
+
+        # key=kontonummer, gränser för uttag och överföringar, se set_limit
+        self.limits: dict[int, VelocityLimit] = {}
+
+        # ökar med varje ändring av ett konto, se snapshot
+        self.version = 0
+        # key=version, antal öppna ögonblicksbilder av den versionen
+        self.snapshots: dict[int, int] = {}
+        # key=kontonummer, gamla tillstånd (version, konto) som öppna
+        # ögonblicksbilder behöver, None om kontot raderats
+        self.versions: dict[int, list[tuple[int, Account | None]]] = {}
+        # versioner vars ögonblicksbilder stängts, städas av _collect
+        self.released: list[int] = []
+
+    def register_customer(self, customer: Customer):
+        customer.number = self.customer_number
+        self.customer_number += 1
+        self.customers[customer.number] = customer
+        self.customer_index.add(customer)
+
+    def register_account(self, account: Account, customer: Customer | None = None):
+        """Registrera ett konto, kastar UnknownCurrency om valutan saknar kurs."""
+        # innan något ändras, annars hamnar kontot bara i en del av indexen
+        self._check_currency(account)
+
+        if customer is not None:
+            account.customer = customer.number
+
         account_number = self.account_number
 
         # öka kontonummer så att nästa konto får ett unikt nummer
         self.account_number += 1
 
+        self._start_quarters(account)
+        self._add_account(account_number, account)
+
+    def register_accounts(
+        self, accounts: list[Account], customer: Customer | None = None
+    ):
+        """Registrera flera konton, kontonumren reserveras i ett steg.
+
+        Kastar UnknownCurrency utan att registrera något om en valuta saknar kurs.
+        """
+        for account in accounts:
+            self._check_currency(account)
+
+        if customer is not None:
+            for account in accounts:
+                account.customer = customer.number
+
+        first = self.account_number
+        self.account_number += len(accounts)
+
+        for account_number, account in enumerate(accounts, first):
+            self._start_quarters(account)
+            self._add_account(account_number, account)
+
+    def _check_currency(self, account: Account):
+        # saldon räknas om till basvalutan i totaler och saldoindex
+        self.rates.rate(account.currency, BASE)
+
+    def _start_quarters(self, account: Account):
+        """Räkna årets kvartal innan ett nytt ISK öppnades med saldot 0.
+
+        Kvartal som inte registrerats fylls med saldot vid årsskiftet, men
+        ett konto som öppnas mitt i året fanns inte när de tidigare
+        kvartalen (och det pågående) började. Bara bankens första kvartal,
+        som aldrig registreras, räknas med saldot.
+        """
+        if account.type != AccountType.ISK or self.month == 0:
+            return
+
+        if account.fields["quarters"] == 0:
+            account.fields["quarters"] = self.month % 12 // 3 + 1
+
+    def _add_account(self, account_number: int, account: Account):
         account.number = account_number
+        account.accrued_month = self.month
+
+        # nyare än alla öppna ögonblicksbilder, så att de inte ser kontot
+        self.version += 1
+        account.version = self.version
         self.accounts[account_number] = account
+        self.accounts_by_type[account.type][account_number] = account
+        self.index.add(account)
+
+        customer = self.customers.get(account.customer)
+        if customer is not None:
+            customer.accounts[account_number] = account
+            customer.index.add(account)
+
+        account.history = TransactionHistory(self.history_window, self.history_store)
+
+        self._record(EventKind.OPEN, account, account.balance)
+        if self.integrity is not None:
+            self.integrity.update(account)
+        self._notify(account, {"opened"})
 
     def delete_account(self, account_number: int) -> bool:
         account = self.accounts.get(account_number)
 
         # kontot kan inte raderas om det finns pengar på det
-        if account is None or account.balance > 0:
+        if account is None or self.read_account(account).balance > 0:
             return False
 
+        account = self._writable(account)
+        if account_number in self.versions:
+            self.versions[account_number].append((self.version, None))
+
         del self.accounts[account_number]
+        self.accounts_by_type[account.type].pop(account_number, None)
+        self.index.remove(account_number)
+        self.limits.pop(account_number, None)
+        if self.ranking is not None:
+            self.ranking.remove(account_number)
+        if self.integrity is not None:
+            self.integrity.remove(account_number)
+
+        customer = self.customers.get(account.customer)
+        if customer is not None:
+            customer.accounts.pop(account_number, None)
+            customer.index.remove(account_number)
+            customer.ranking.remove(account_number)
+
+        self._record(EventKind.CLOSE, account, -account.balance)
+        if account.history is not None:
+            account.history.close()
+        self._notify(account, {"closed"})
         return True
 
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def set_limit(
+        self,
+        account: Account,
+        max_withdrawn: float | None = None,
+        max_transfers: int | None = None,
+    ):
+        """Sätt gränser för uttag per dygn och överföringar per timme från kontot.
+
+        max_withdrawn är det högsta beloppet som får tas ut eller föras över
+        under 24 timmar och max_transfers antalet överföringar under en timme,
+        None betyder ingen gräns. Uttag och överföringar som skulle gå över en
+        gräns kastar LimitExceeded.
+        """
+        if max_withdrawn is None and max_transfers is None:
+            self.limits.pop(account.number, None)
+        else:
+            self.limits[account.number] = VelocityLimit(
+                max_withdrawn, max_transfers, account.currency
+            )
+
+    # läsningar, vid lazy_accrual uppdateras kontot först
+
+    def read_account(self, account: Account) -> Account:
+        if not self.lazy_accrual or account.accrued_month >= self.month:
+            return account
+
+        account = self._writable(account)
+        state = self._watch(account)
+        before = account.balance
+
+        account.accrue_to(self.month)
+
+        if account.balance != before:
+            self._record(EventKind.YEARLY_UPDATE, account, account.balance - before)
+
+        self._publish(account, state)
+        return account
+
+    def account_view(self, account: Account) -> Account:
+        """Kontot som det ser ut vid bankens klocka, utan att ändra det.
+
+        Används av läsare som inte ska logga eller notifiera, t.ex. exporter.
+        """
+        if not self.lazy_accrual or account.accrued_month >= self.month:
+            return account
+
+        view = account.copy()
+        view.accrue_to(self.month)
+        return view
+
+    def read_accounts(self, customer: Customer | None = None):
+        """Alla konton, eller bara kundens om customer anges."""
+        accounts = self.accounts if customer is None else customer.accounts
+
+        for account in list(accounts.values()):
+            yield self.read_account(account)
+
+    def totals(self, customer: Customer | None = None) -> dict[str, float]:
+        """Summan av saldona per valuta, eller kundens om customer anges.
+
+        Kundens summor hålls uppdaterade av banken, kontona behöver bara läsas
+        om räntor ska bokföras först (lazy_accrual).
+        """
+        if customer is None:
+            totals = {}
+            for account in self.read_accounts():
+                totals[account.currency] = (
+                    totals.get(account.currency, 0.0) + account.balance
+                )
+            return totals
+
+        if self.lazy_accrual:
+            for _ in self.read_accounts(customer):
+                pass
+
+        return dict(customer.totals)
+
+    def total(self, customer: Customer | None = None) -> float:
+        """Totala tillgångar i basvalutan, en omräkning per valuta."""
+        return self.rates.convert_totals(self.totals(customer), BASE)
+
+    def ranking_for(self, customer: Customer | None = None) -> BalanceIndex:
+        """Saldoindexet för hela banken, eller för kundens konton.
+
+        Vid lazy_accrual bokförs räntor på kontona först, en gång per månad
+        som klockan flyttats fram.
+        """
+        key = None if customer is None else customer.number
+
+        if self.lazy_accrual and self.ranked_months.get(key, -1) < self.month:
+            for _ in self.read_accounts(customer):
+                pass
+            self.ranked_months[key] = self.month
+
+        return self.ranking if customer is None else customer.ranking
+
+    def top_accounts(self, n: int, customer: Customer | None = None) -> list[Account]:
+        """De n kontona med störst saldo i basvalutan, störst först."""
+        return [self.accounts[number] for number in self.ranking_for(customer).top(n)]
+
+    def account_rank(self, account: Account, customer: Customer | None = None) -> int:
+        """Kontots placering efter saldo från 0 (störst), bland kundens konton om customer anges."""
+        return self.ranking_for(customer).rank(account.number)
+
+    def accounts_between(
+        self, low: float, high: float, customer: Customer | None = None
+    ) -> list[Account]:
+        """Konton med saldo (i basvalutan) mellan low och high, minst saldo först."""
+        return [
+            self.accounts[number]
+            for number in self.ranking_for(customer).between(low, high)
+        ]
+
+    def checking_account(self, customer: Customer | None = None) -> Account | None:
+        """Första användarkontot, hos kunden om customer anges."""
+        if customer is None:
+            return next(iter(self.accounts_of_type(AccountType.CHECKING)), None)
+
+        return next(
+            (
+                account
+                for account in customer.accounts.values()
+                if account.type == AccountType.CHECKING
+            ),
+            None,
+        )
+
+    def projected_total(self, years: int, customer: Customer | None = None) -> float:
+        """Totala tillgångar efter years årsskiften utan transaktioner.
+
+        Kontona ändras inte. De delas upp i grupper med samma villkor och
+        varje grupps summa räknas upp med en faktor, så en faktor räknas
+        bara ut en gång per grupp. Stående överföringar räknas inte med.
+        Med customer räknas bara kundens konton.
+        """
+        accounts = self.accounts if customer is None else customer.accounts
+
+        if years <= 0:
+            # summor per valuta, en omräkning per valuta
+            totals: dict[str, float] = {}
+            for account in list(accounts.values()):
+                account = self.account_view(account)
+                totals[account.currency] = (
+                    totals.get(account.currency, 0.0) + account.balance
+                )
+            return self.rates.convert_totals(totals, BASE)
+
+        total = 0.0
+        # key=(valuta, ränta, skatt, antal år), summan av gruppens saldon
+        groups: dict[tuple[str, float, float, int], float] = {}
+
+        for account in list(accounts.values()):
+            account = self.account_view(account)
+            currency = account.currency
+
+            match account.type:
+                case AccountType.CHECKING:
+                    key = (currency, 0.0, 0.0, 0)
+                    balance = account.balance
+
+                case AccountType.SAVINGS:
+                    key = (currency, account.fields["interest"], 0.0, years)
+                    balance = account.balance
+
+                case AccountType.ISK:
+                    # första året beror på årets kvartal och insättningar,
+                    # kvartal som återstår har nuvarande saldo
+                    fields = account.fields
+                    capital_base = (
+                        fields["quarter_balances"]
+                        + (4 - fields["quarters"]) * account.balance
+                        + fields["yearly_deposits"]
+                    ) / 4.0
+
+                    key = (
+                        currency,
+                        fields["return_rate"],
+                        fields["standardized_tax"],
+                        years - 1,
+                    )
+                    balance = (
+                        account.balance * (1.0 + fields["return_rate"])
+                        - capital_base * fields["standardized_tax"]
+                    )
+
+                case AccountType.AF:
+                    key = (currency, account.fields["return_rate"], 0.0, years)
+                    balance = account.balance
+
+            groups[key] = groups.get(key, 0.0) + balance
+
+        for (currency, *terms), balance in groups.items():
+            total += self.rates.convert(balance * factors.get(*terms), currency, BASE)
+
+        return total
+
+    def advance(self, months: int = 1):
+        """Flytta fram klockan och gör stående överföringar som infaller under tiden.
+
+        Med lazy_accrual rörs bara konton som har stående överföringar.
+        """
+        month = self.month + months
+
+        if self.lazy_accrual:
+            self.run_standing_orders(month)
+            self.month = month
+            return
+
+        while self.month < month:
+            self.month += 1
+
+            if self.month % 12 == 0:
+                self.apply_yearly_update()
+            if self.month % 3 == 0:
+                self.apply_quarterly_update()
+
+            self.run_standing_orders(self.month)
+
+    # stående överföringar
+
+    def add_standing_order(
+        self,
+        account_from: Account,
+        account_to: Account,
+        amount: float,
+        interval: int = 1,
+        month: int | None = None,
+    ) -> StandingOrder:
+        """Överför amount var interval:e månad, första gången month (annars nästa månad)."""
+        return self.scheduler.add(
+            account_from.number,
+            account_to.number,
+            amount,
+            interval,
+            self.month + 1 if month is None else month,
+        )
+
+    def run_standing_orders(self, month: int):
+        """Gör alla stående överföringar som infaller senast month, i tidsordning."""
+        while (next_month := self.scheduler.next_month()) is not None:
+            if next_month > month:
+                break
+
+            # klockan står på överföringarnas månad medan de görs, så att
+            # kontona räknas upp till rätt tidpunkt
+            self.month = max(self.month, next_month)
+
+            for order in self.scheduler.pop_batch(self.month):
+                self._execute_standing_order(order)
+
+    def _execute_standing_order(self, order: StandingOrder):
+        account_from = self.accounts.get(order.account_from)
+        account_to = self.accounts.get(order.account_to)
+
+        if account_from is None or account_to is None:
+            self.scheduler.record_failure(order, self.month, "Kontot finns inte")
+            self.scheduler.cancel(order.id)
+            return
+
+        try:
+            if self.transfer(account_from, account_to, order.amount):
+                order.executions += 1
+            else:
+                self.scheduler.record_failure(order, self.month, "Otillräckligt saldo")
+        except (LimitExceeded, UnknownCurrency) as error:
+            self.scheduler.record_failure(order, self.month, str(error))
+
+        self.scheduler.reschedule(order)
+
+    # transaktioner ska gå via banken så att de kan loggas
+    #
+    # med idempotency_key görs en transaktion bara en gång även om den skickas
+    # igen, en upprepning räknas som lyckad utan att göras. misslyckade
+    # transaktioner sparas inte eftersom de inte ändrat något
+    #
+    # uttag och överföringar kontrolleras mot kontots gränser (set_limit) innan
+    # något ändras, och räknas in i gränsernas fönster när de lyckats
+
+    def deposit(
+        self, account: Account, amount: float, idempotency_key: str | None = None
+    ):
+        if idempotency_key is not None and self.idempotency.seen(idempotency_key):
+            return
+
+        account = self._writable(self.read_account(account))
+        state = self._watch(account)
+        before = account.balance
+        account.deposit(amount)
+
+        self._record(EventKind.DEPOSIT, account, account.balance - before)
+        self._publish(account, state)
+
+        if idempotency_key is not None:
+            self.idempotency.add(idempotency_key)
+
+    def withdraw(
+        self, account: Account, amount: float, idempotency_key: str | None = None
+    ) -> bool:
+        if idempotency_key is not None and self.idempotency.seen(idempotency_key):
+            return True
+
+        now = time.time()
+        limit = self.limits.get(account.number)
+        if limit is not None:
+            limit.check(now, amount, transfer=False)
+
+        account = self._writable(self.read_account(account))
+        state = self._watch(account)
+        before = account.balance
+        tax = account.withdrawal_tax(amount)
+        if not account.withdraw(amount):
+            return False
+
+        # skatten vid uttag från AF bokförs för sig
+        self._record(EventKind.WITHDRAW, account, account.balance - before + tax)
+        if tax:
+            self._record(EventKind.TAX, account, -tax)
+        self._publish(account, state)
+
+        if limit is not None:
+            limit.add(now, amount, transfer=False)
+
+        if idempotency_key is not None:
+            self.idempotency.add(idempotency_key)
+        return True
+
+    def transfer(
+        self,
+        account_from: Account,
+        account_to: Account,
+        amount: float,
+        idempotency_key: str | None = None,
+        withdrawal: bool = False,
+    ) -> bool:
+        if idempotency_key is not None and self.idempotency.seen(idempotency_key):
+            return True
+
+        # ett uttag till kundens lönekonto räknas mot uttagsgränsen, men inte
+        # som en överföring
+        now = time.time()
+        limit = self.limits.get(account_from.number)
+        if limit is not None:
+            limit.check(now, amount, transfer=not withdrawal)
+
+        # amount är i avsändarens valuta, mottagaren får det omräknat
+        received = self.rates.convert(
+            amount, account_from.currency, account_to.currency
+        )
+
+        account_from = self._writable(self.read_account(account_from))
+        account_to = self._writable(self.read_account(account_to))
+
+        state_from = self._watch(account_from)
+        state_to = self._watch(account_to)
+
+        before_from = account_from.balance
+        tax = account_from.withdrawal_tax(amount)
+        if not account_from.withdraw(amount):
+            return False
+
+        # det som faktiskt dragits och satts in, skatten vid uttag från AF
+        # bokförs för sig
+        sent = account_from.balance - before_from + tax
+        self._record(EventKind.TRANSFER, account_from, sent, account_to.number)
+        if tax:
+            self._record(EventKind.TAX, account_from, -tax)
+
+        # efter uttaget, avsändaren och mottagaren kan vara samma konto
+        before_to = account_to.balance
+        account_to.deposit(received)
+        self._record(
+            EventKind.TRANSFER,
+            account_to,
+            account_to.balance - before_to,
+            account_from.number,
+        )
+
+        if self.integrity is not None:
+            # mottagaren ska få lika mycket värt som avsändaren skickade, räknat
+            # från saldona, så avrundningsfelet beror på deras storlek
+            to_base = self.rates.convert
+            self.integrity.transferred(
+                -to_base(sent, account_from.currency, BASE),
+                to_base(account_to.balance - before_to, account_to.currency, BASE),
+                to_base(abs(before_from), account_from.currency, BASE)
+                + to_base(abs(account_to.balance), account_to.currency, BASE),
+            )
+
+        self._publish(account_from, state_from)
+        self._publish(account_to, state_to)
+
+        if limit is not None:
+            limit.add(now, amount, transfer=not withdrawal)
+
+        if idempotency_key is not None:
+            self.idempotency.add(idempotency_key)
+        return True
+
+    def accounts_of_type(self, type: AccountType):
+        return self.accounts_by_type[type].values()
+
+    def apply_quarterly_update(self):
+        # bara ISK påverkas, och inget som visas ändras så ingen notifieras
+        for account in list(self.accounts_of_type(AccountType.ISK)):
+            account = self._writable(self.read_account(account))
+            account.apply_quarterly_update()
+            if self.integrity is not None:
+                self.integrity.update(account)
+
     def apply_yearly_update(self):
-        for account in self.accounts.values():
+        for account in list(self.accounts.values()):
+            account = self._writable(self.read_account(account))
+            state = self._watch(account)
+            before = account.balance
             account.apply_yearly_update()
+
+            if account.balance != before:
+                self._record(EventKind.YEARLY_UPDATE, account, account.balance - before)
+
+            self._publish(account, state)
+
+    def apply_state(
+        self,
+        account: Account,
+        balance: float,
+        fields: dict,
+        kind: EventKind = EventKind.SIMULATION,
+        accrued_month: int | None = None,
+    ):
+        """Skriv över ett kontos saldo och fält, t.ex. med resultatet av en simulering."""
+        account = self._writable(self.read_account(account))
+        state = self._watch(account)
+        before = account.balance
+
+        account.balance = balance
+        account.fields.update(fields)
+        if accrued_month is not None:
+            account.accrued_month = accrued_month
+
+        if account.balance != before:
+            self._record(kind, account, account.balance - before)
+
+        self._publish(account, state)
+
+    def _writable(self, account: Account) -> Account:
+        """Kontot som ska ändras. Sandlådor byter ut det mot en egen kopia.
+
+        Anropas före varje ändring. Om en öppen ögonblicksbild ser kontots
+        nuvarande tillstånd sparas en kopia av det först.
+        """
+        if self.released:
+            self._collect()
+
+        if self.snapshots and account.version <= max(self.snapshots):
+            self.versions.setdefault(account.number, []).append(
+                (account.version, account.copy())
+            )
+
+        # versionen ändras innan kontot, så att en läsare i en annan tråd som
+        # kopierar kontot samtidigt märker det och läser den sparade kopian
+        self.version += 1
+        account.version = self.version
+
+        return account
+
+    # kontrollsummor, för att visa att inga pengar skapats eller försvunnit
+    # efter en körning
+
+    def verify(self):
+        """Kastar IntegrityError om saldona inte stämmer med det som bokförts.
+
+        Överföringar ska inte ändra de totala tillgångarna, och insättningar,
+        uttag och årsuppdateringar ska ändra dem med de bokförda beloppen.
+        Konton hashas om direkt efter varje ändring i banken, så det här är
+        en jämförelse per valuta. Ändringar utanför banken hittas av audit.
+        """
+        if self.integrity is not None:
+            self.integrity.verify()
+
+    def audit(self) -> list[tuple[int, int]]:
+        """Kontonummerintervall (första, sista) med konton som ändrats utanför banken.
+
+        Räknar om kontrollsummorna för alla konton och jämför dem med de som
+        hållits uppdaterade, tom lista om allt stämmer.
+        """
+        if self.integrity is None:
+            return []
+
+        checksums = Checksums.build(self.accounts.values(), self.integrity.bucket_size)
+        return checksums.diff(self.integrity)
+
+    # ögonblicksbilder (MVCC), läsare ser banken som den var när bilden togs
+    # utan att skrivningar behöver vänta på dem
+
+    def snapshot(self) -> Snapshot:
+        """Ögonblicksbild av banken, ska stängas när den inte behövs längre.
+
+        Ska tas i samma tråd som ändrar banken, men kan sen läsas i en annan.
+        """
+        if self.released:
+            self._collect()
+
+        self.snapshots[self.version] = self.snapshots.get(self.version, 0) + 1
+        return Snapshot(self, self.version, self.month, self.account_number)
+
+    def _collect(self):
+        """Ta bort sparade tillstånd som ingen öppen ögonblicksbild behöver."""
+        while self.released:
+            version = self.released.pop()
+            self.snapshots[version] -= 1
+            if not self.snapshots[version]:
+                del self.snapshots[version]
+
+        if not self.snapshots:
+            self.versions.clear()
+            return
+
+        active = sorted(self.snapshots)
+
+        for number, chain in list(self.versions.items()):
+            account = self.accounts.get(number)
+            keep = []
+
+            for i, (version, state) in enumerate(chain):
+                # tillståndet gällde fram till nästa version
+                if i + 1 < len(chain):
+                    end = chain[i + 1][0]
+                else:
+                    end = account.version if account is not None else version
+
+                j = bisect_left(active, version)
+                if state is None or (j < len(active) and active[j] < end):
+                    keep.append((version, state))
+
+            # ett raderat konto behöver bara markeras om det finns äldre tillstånd
+            if keep and keep[0][1] is None:
+                keep.pop(0)
+
+            if keep:
+                self.versions[number] = keep
+            else:
+                del self.versions[number]
+
+    def _record(
+        self,
+        kind: EventKind,
+        account: Account,
+        amount: float,
+        counterparty: int | None = None,
+    ):
+        timestamp = time.time()
+
+        if self.ledger is not None:
+            self.ledger.append(kind, account.number, amount, counterparty, timestamp)
+
+        # alla ändringar av saldot passerar här, så kundens summor och
+        # saldoindexen hålls aktuella
+        customer = self.customers.get(account.customer)
+        if customer is not None:
+            customer.totals[account.currency] = (
+                customer.totals.get(account.currency, 0.0) + amount
+            )
+
+        if self.integrity is not None:
+            self.integrity.record(kind, account.currency, amount)
+
+        # stängda konton har redan tagits bort ur indexen
+        if self.ranking is not None and kind != EventKind.CLOSE:
+            balance = self.rates.convert(account.balance, account.currency, BASE)
+            self.ranking.update(account.number, balance)
+            if customer is not None:
+                customer.ranking.update(account.number, balance)
+
+        # sist, historiken kan behöva skriva till disk och ett fel där ska
+        # inte lämna summorna och indexen halvt uppdaterade
+        if account.history is not None:
+            account.history.append(timestamp, kind, amount, counterparty)
+
+    # ändringsnotiser, tillståndet sparas bara om någon lyssnar
+
+    def _watch(self, account: Account) -> tuple[float, dict] | None:
+        if not self.listeners and not account.listeners:
+            return None
+
+        return account.balance, dict(account.fields)
+
+    def _publish(self, account: Account, state: tuple[float, dict] | None):
+        # anropas efter varje ändring, kontot hashas om direkt så att en
+        # senare ändring utanför banken syns i audit
+        if self.integrity is not None:
+            self.integrity.update(account)
+
+        if state is None:
+            return
+
+        balance, fields = state
+        changes = set()
+
+        if account.balance != balance:
+            changes.add("balance")
+        if account.fields != fields:
+            changes.add("fields")
+
+        # inget att säga om kontot är oförändrat
+        if changes:
+            self._notify(account, changes)
+
+    def _notify(self, account: Account, changes: set[str]):
+        for listener in list(account.listeners):
+            listener(account, changes)
+
+        for listener in list(self.listeners):
+            listener(account, changes)
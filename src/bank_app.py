@@ -1,5 +1,10 @@
+import os
+
 from textual.app import App
-from bank import Account, Bank
+from bank import Account, Bank, Customer
+from compaction import Compactor
+from currency import RateTable
+from ledger import Ledger
 from screen.greeting import GreetingScreen
 from theme import theme
 
@@ -10,28 +15,67 @@ class BankApp(App[None]):
     def __init__(self):
         super().__init__()
 
-        self.bank = Bank()
+        # huvudbokens segment skrivs till en temporär katalog som tas bort
+        # när appen avslutas, inget sparas mellan körningar
+        self.bank = Bank(
+            ledger=Ledger(),
+            lazy_accrual=True,
+            rates=RateTable.load(os.path.join(os.path.dirname(__file__), "rates.json")),
+        )
+
+        # inloggad kund, väljs i GreetingScreen
+        self.customer: Customer | None = None
+
+        # Skapa exempelkunder och exempelkonton
 
-        # Skapa exempelkonton
+        anna = Customer("Anna Lindqvist")
+        self.bank.register_customer(anna)
 
         checking = Account.new_checking("Användarkonto")
         checking.balance = 6000
-        self.bank.register_account(checking)
+        self.bank.register_account(checking, anna)
 
         savings = Account.new_savings("Sparkonto", 0.02)
         savings.balance = 80000
-        self.bank.register_account(savings)
+        self.bank.register_account(savings, anna)
 
         isk = Account.new_isk("Mina aktier", 0.06, 0.0125)
         isk.balance = 130000
-        self.bank.register_account(isk)
+        self.bank.register_account(isk, anna)
+        self.bank.set_limit(isk, max_withdrawn=50000, max_transfers=5)
 
         af = Account.new_af("Nordea Stratega 50", 0.05, 0.3)
-        af.balance = 40614.4
-        self.bank.register_account(af)
+        af.deposit(40614.4)
+        self.bank.register_account(af, anna)
+
+        erik = Customer("Erik Berg")
+        self.bank.register_customer(erik)
+
+        checking = Account.new_checking("Användarkonto")
+        checking.balance = 12500
+        self.bank.register_account(checking, erik)
+
+        savings = Account.new_savings("Buffert", 0.025)
+        savings.balance = 45000
+        self.bank.register_account(savings, erik)
+
+        vacation = Account.new_savings("Semesterkassa", 0.01, "EUR")
+        vacation.balance = 2000
+        self.bank.register_account(vacation, erik)
 
     def on_mount(self):
+        # huvudbokens gamla segment packas i bakgrunden, se Ledger.compact
+        self.compactor = None
+        if self.bank.ledger is not None:
+            self.compactor = Compactor(self.bank.ledger)
+            self.compactor.start()
+
         self.register_theme(theme)
         self.theme = "custom"
 
         self.push_screen(GreetingScreen())
+
+    def on_unmount(self):
+        if self.compactor is not None:
+            self.compactor.stop()
+            self.bank.ledger.close()
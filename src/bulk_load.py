@@ -0,0 +1,173 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from bank import Account, AccountType, Bank
+from currency import BASE
+from validation import validate_percentage_input
+
+# kontotyp anges med namn (t.ex. "isk") eller med texten som visas i appen
+ACCOUNT_TYPES: dict[str, AccountType] = {
+    **{type.name.casefold(): type for type in AccountType},
+    **{type.value.casefold(): type for type in AccountType},
+}
+
+
+def parse_account(row: dict, currencies=None) -> Account:
+    """Skapa ett konto från en rad med name, type, rate, tax och currency.
+
+    Räntor anges i procent som i CreateAccountScreen och valideras med samma
+    regler. Utan currency blir kontot i BASE, med currencies måste valutan
+    finnas bland dem. Kastar ValueError med ett meddelande om raden är ogiltig.
+    """
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("Ange ett kontonamn")
+
+    type = ACCOUNT_TYPES.get(str(row.get("type") or "").strip().casefold())
+    rate = validate_percentage_input(str(row.get("rate")))
+    tax = validate_percentage_input(str(row.get("tax")))
+
+    currency = str(row.get("currency") or BASE).strip().upper()
+    if currencies is not None and currency not in currencies:
+        raise ValueError("Okänd valuta")
+
+    match type:
+        case None:
+            raise ValueError("Välj kontotyp")
+
+        case AccountType.CHECKING:
+            return Account.new_checking(name, currency)
+
+        case AccountType.SAVINGS:
+            if not rate:
+                raise ValueError("Ogiltig ränta")
+
+            return Account.new_savings(name, rate / 100.0, currency)
+
+        case AccountType.ISK:
+            if not rate:
+                raise ValueError("Ogiltig avkastning")
+            if not tax:
+                raise ValueError("Ogiltig schablonskatt")
+
+            return Account.new_isk(name, rate / 100.0, tax / 100.0, currency)
+
+        case AccountType.AF:
+            if not rate:
+                raise ValueError("Ogiltig avkastning")
+            if not tax:
+                raise ValueError("Ogiltig vinstskatt")
+
+            return Account.new_af(name, rate / 100.0, tax / 100.0, currency=currency)
+
+
+class BulkLoader:
+    """
+    läser konton från en CSV- eller JSONL-fil rad för rad och lämnar dem i
+    omgångar, så att hela filen aldrig behöver ligga i minnet
+
+    CSV-filer ska ha rubrikraden name,type,rate,tax (och valfritt currency)
+    och JSONL-filer ett objekt per rad med samma nycklar
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 5000,
+        max_errors: int = 100,
+        currencies=None,
+    ):
+        self.path = path
+        # tillåtna valutor, None tillåter alla
+        self.currencies = currencies
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+
+        self.rows = 0
+        self.loaded = 0
+        self.rejected = 0
+        # (radnummer, meddelande) för de första max_errors felen
+        self.errors: list[tuple[int, str]] = []
+
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def progress(self) -> float:
+        return self.bytes_read / self.total_bytes if self.total_bytes else 1.0
+
+    def _lines(self, file):
+        for line in file:
+            self.bytes_read += len(line.encode("utf-8"))
+            yield line
+
+    def _rows(self, file):
+        if self.path.endswith((".jsonl", ".ndjson")):
+            for line in self._lines(file):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        row = None
+
+                    # ogiltiga rader blir tomma och underkänns av parse_account
+                    yield row if isinstance(row, dict) else {}
+        else:
+            yield from csv.DictReader(self._lines(file))
+
+    def batches(self):
+        """Giltiga konton i listor om som mest batch_size."""
+        self.started = time.perf_counter()
+        batch = []
+
+        with open(self.path, encoding="utf-8", newline="") as file:
+            for row in self._rows(file):
+                self.rows += 1
+
+                try:
+                    batch.append(parse_account(row, self.currencies))
+                except ValueError as error:
+                    self.rejected += 1
+                    if len(self.errors) < self.max_errors:
+                        self.errors.append((self.rows, str(error)))
+
+                if len(batch) >= self.batch_size:
+                    self.loaded += len(batch)
+                    self.elapsed = time.perf_counter() - self.started
+                    yield batch
+                    batch = []
+
+        self.loaded += len(batch)
+        self.elapsed = time.perf_counter() - self.started
+        if batch:
+            yield batch
+
+
+def load_accounts(bank: Bank, path: str, batch_size: int = 5000) -> BulkLoader:
+    loader = BulkLoader(path, batch_size, currencies=bank.rates.currencies)
+
+    for batch in loader.batches():
+        bank.register_accounts(batch)
+
+    return loader
+
+
+if __name__ == "__main__":
+    loader = load_accounts(Bank(), sys.argv[1])
+
+    print(
+        f"{loader.loaded} konton inlästa, {loader.rejected} ogiltiga rader "
+        f"({loader.rows_per_second:.0f} rader/s)"
+    )
+    for line, message in loader.errors:
+        print(f"rad {line}: {message}")
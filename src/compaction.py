@@ -0,0 +1,53 @@
+import threading
+
+from ledger import Ledger
+
+
+class Compactor:
+    """
+    packar huvudbokens gamla segment i en egen tråd, se Ledger.compact
+
+    max_bytes_per_second begränsar hur fort segment skrivs till disk, tråden
+    väntar efter varje skrivning så att medelhastigheten inte går över
+    gränsen. värdet kan ändras medan tråden kör, None betyder ingen gräns
+    """
+
+    def __init__(
+        self,
+        ledger: Ledger,
+        interval: float = 1.0,
+        max_bytes_per_second: float | None = None,
+    ):
+        self.ledger = ledger
+        # sekunder mellan varje kontroll av om något behöver packas
+        self.interval = interval
+        self.max_bytes_per_second = max_bytes_per_second
+
+        self.written = 0
+
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="ledger-compactor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def throttle(self, size: int):
+        self.written += size
+
+        if self.max_bytes_per_second:
+            # avbryts direkt om tråden stoppas
+            self.stopped.wait(size / self.max_bytes_per_second)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.ledger.compact(self.throttle)
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+
+class FactorCache:
+    """
+    sparade ränta-på-ränta-faktorer (1 + rate - tax) ** years
+
+    många konton har samma villkor, så samma faktor räknas bara ut en gång.
+    som mest max_size faktorer sparas, den som använts minst nyligen tas
+    bort först (LRU)
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+
+        # key=(rate, tax, years)
+        self.factors: OrderedDict[tuple[float, float, int], float] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.factors)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, rate: float, tax: float, years: int) -> float:
+        key = (rate, tax, years)
+
+        factor = self.factors.get(key)
+        if factor is not None:
+            self.hits += 1
+            self.factors.move_to_end(key)
+            return factor
+
+        self.misses += 1
+        factor = (1.0 + rate - tax) ** years
+
+        self.factors[key] = factor
+        if len(self.factors) > self.max_size:
+            self.factors.popitem(last=False)
+
+        return factor
+
+
+# delas av alla konton och banker
+factors = FactorCache()
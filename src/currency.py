@@ -0,0 +1,67 @@
+import json
+
+# valutan som totaler visas i
+BASE = "SEK"
+
+# valutor som visas med symbol istället för valutakod
+SYMBOLS = {"SEK": "kr"}
+
+
+def format_amount(amount: float, currency: str = BASE, sign: bool = False) -> str:
+    """Belopp med två decimaler och valuta, t.ex. "12.50 kr" eller "+3.00 EUR"."""
+    symbol = SYMBOLS.get(currency, currency)
+    return f"{amount:+.2f} {symbol}" if sign else f"{amount:.2f} {symbol}"
+
+
+class UnknownCurrency(ValueError):
+    """Valutakurs saknas, meddelandet kan visas för användaren."""
+
+
+class RateTable:
+    """
+    valutakurser, rates anger hur mycket en enhet av basvalutan är värd i
+    varje valuta
+
+    alla korskurser räknas ut en gång när tabellen skapas (en matris med en
+    kurs för varje par av valutor), så en omräkning är bara en uppslagning
+    """
+
+    def __init__(self, base: str = BASE, rates: dict[str, float] | None = None):
+        self.base = base
+
+        rates = {base: 1.0, **(rates or {})}
+        self.currencies = sorted(rates)
+
+        # key=från, key=till
+        self.cross: dict[str, dict[str, float]] = {
+            source: {target: rates[target] / rates[source] for target in rates}
+            for source in rates
+        }
+
+    @staticmethod
+    def load(path: str) -> "RateTable":
+        """Läs en JSON-fil på formen {"base": "SEK", "rates": {"EUR": 0.087, ...}}."""
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+
+        return RateTable(data["base"], data["rates"])
+
+    def rate(self, source: str, target: str) -> float:
+        try:
+            return self.cross[source][target]
+        except KeyError:
+            missing = target if source in self.cross else source
+            raise UnknownCurrency(f"Valutakurs saknas för {missing}") from None
+
+    def convert(self, amount: float, source: str, target: str) -> float:
+        if source == target:
+            return amount
+
+        return amount * self.rate(source, target)
+
+    def convert_totals(self, totals: dict[str, float], target: str) -> float:
+        """Summan av belopp i olika valutor, en omräkning per valuta."""
+        return sum(
+            self.convert(amount, currency, target)
+            for currency, amount in totals.items()
+        )
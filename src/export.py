@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+import lzma
+import zlib
+
+from bank import Account, Bank
+from snapshot import Snapshot
+
+COLUMNS = [
+    "number",
+    "name",
+    "type",
+    "balance",
+    "currency",
+    "interest",
+    "return_rate",
+    "standardized_tax",
+    "capital_gains_tax",
+    "capital_gains",
+    "realized_gains",
+    "starting_balance",
+    "yearly_transactions",
+]
+
+
+def account_row(account: Account) -> dict:
+    row = {
+        "number": account.number,
+        "name": account.name,
+        "type": account.type.name,
+        "balance": account.balance,
+        "currency": account.currency,
+    }
+
+    # bara fält som är tal, t.ex. inte AF-kontots poster
+    for key in COLUMNS[5:]:
+        if key in account.fields:
+            row[key] = account.fields[key]
+
+    return row
+
+
+# format som kan skrivas
+FORMATS = ("csv", "jsonl")
+# komprimeringar som open_output kan skriva
+COMPRESSIONS = (None, "zlib", "lzma")
+
+
+class CompressedWriter:
+    """Komprimerar allt som skrivs med compressor (zlib eller lzma) innan det når filen."""
+
+    def __init__(self, file, compressor):
+        self.file = file
+        self.compressor = compressor
+
+    def write(self, data: bytes):
+        self.file.write(self.compressor.compress(data))
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+
+def open_output(path: str, compression: str | None, buffer_size: int):
+    match compression:
+        case None:
+            return open(path, "wb", buffering=buffer_size)
+        case "zlib":
+            return CompressedWriter(
+                open(path, "wb", buffering=buffer_size), zlib.compressobj()
+            )
+        case "lzma":
+            return CompressedWriter(
+                open(path, "wb", buffering=buffer_size), lzma.LZMACompressor()
+            )
+
+    raise ValueError(f"Okänd komprimering: {compression}")
+
+
+def export_accounts(
+    bank: Bank,
+    path: str,
+    format: str = "csv",
+    compression: str | None = None,
+    chunk_size: int = 1000,
+    buffer_size: int = 1 << 20,
+    progress=None,
+    snapshot: Snapshot | None = None,
+    numbers: list[int] | None = None,
+) -> int:
+    """Skriv alla konton till path som CSV eller JSONL och returnera antal rader.
+
+    format är "csv" eller "jsonl", annat (eller en okänd komprimering) ger
+    ValueError.
+
+    Kontona läses i kontonummerordning och skrivs chunk_size åt gången, så
+    minnesanvändningen beror inte på bankens storlek. compression kan vara
+    None, "zlib" eller "lzma". progress anropas med antal skrivna rader efter
+    varje chunk.
+
+    Kontona läses från snapshot, eller en ögonblicksbild som tas här, så
+    exporten blir konsekvent även om banken ändras under tiden. Körs
+    exporten i en annan tråd ska ögonblicksbilden tas i förväg i den tråd
+    som ändrar banken. Den stängs när exporten är klar. Med numbers skrivs
+    bara de kontona, i den ordningen.
+    """
+    rows = 0
+
+    # ögonblicksbilden stängs även om exporten inte kan göras, annars sparar
+    # banken gamla versioner vid varje ändring
+    try:
+        if format not in FORMATS:
+            raise ValueError(f"Okänt format: {format}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Okänd komprimering: {compression}")
+
+        if snapshot is None:
+            snapshot = bank.snapshot()
+
+        output = open_output(path, compression, buffer_size)
+
+        try:
+            chunk = io.StringIO()
+
+            if format == "csv":
+                writer = csv.DictWriter(chunk, COLUMNS)
+                writer.writeheader()
+
+            for account in snapshot.accounts(numbers):
+                row = account_row(account)
+
+                if format == "csv":
+                    writer.writerow(row)
+                else:
+                    chunk.write(json.dumps(row, ensure_ascii=False))
+                    chunk.write("\n")
+
+                rows += 1
+
+                if rows % chunk_size == 0:
+                    output.write(chunk.getvalue().encode("utf-8"))
+                    chunk.seek(0)
+                    chunk.truncate()
+
+                    if progress is not None:
+                        progress(rows)
+
+            output.write(chunk.getvalue().encode("utf-8"))
+        finally:
+            output.close()
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+
+    if progress is not None:
+        progress(rows)
+
+    return rows
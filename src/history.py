@@ -0,0 +1,178 @@
+from array import array
+from bisect import bisect_right
+import os
+import struct
+import tempfile
+
+from ledger import EventKind
+
+# en rad på disk: tidsstämpel, typ, belopp, motpart
+RECORD = struct.Struct("<dBdq")
+
+KINDS = list(EventKind)
+
+
+class HistoryStore:
+    """
+    en gemensam fil för alla kontons äldre historik, så att antalet öppna
+    filer inte växer med antalet konton
+
+    varje konto skriver sina rader i block och håller själv reda på var
+    blocken ligger. utan path används en temporär fil. filen öppnas först
+    när något skrivs
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.file = None
+
+    def write(self, data: bytes) -> int:
+        """Lägg till data sist i filen och returnera var den hamnade."""
+        if self.file is None:
+            if self.path is None:
+                self.file = tempfile.TemporaryFile()
+            else:
+                self.file = open(self.path, "w+b")
+
+        offset = self.file.seek(0, os.SEEK_END)
+        self.file.write(data)
+        self.file.flush()
+        return offset
+
+    def read(self, offset: int, size: int) -> bytes:
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class TransactionHistory:
+    """
+    kompakt transaktionshistorik för ett konto
+
+    raderna sparas kolumnvis i array:er istället för som objekt, och bara de
+    senaste window raderna hålls i minnet. äldre rader skrivs i block till
+    en HistoryStore med poster av fast storlek, så att valfri rad kan läsas
+    med en bisect över blocken och en seek
+    """
+
+    def __init__(self, window: int = 1000, store: HistoryStore | None = None):
+        self.window = window
+        # skapas vid första utskrivningen om den inte delas med andra konton
+        self.store = store
+
+        self.timestamps = array("d")
+        self.kinds = array("B")
+        self.amounts = array("d")
+        # 0 = ingen motpart, kontonummer börjar på 1
+        self.counterparties = array("q")
+
+        # antal rader som ligger på disk, och var i filen varje block börjar
+        # och vilken rad det börjar med
+        self.spilled = 0
+        self.offsets = array("q")
+        self.starts = array("q")
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.timestamps)
+
+    def append(
+        self,
+        timestamp: float,
+        kind: EventKind,
+        amount: float,
+        counterparty: int | None = None,
+    ):
+        self.timestamps.append(timestamp)
+        self.kinds.append(KINDS.index(kind))
+        self.amounts.append(amount)
+        self.counterparties.append(counterparty or 0)
+
+        if len(self.timestamps) > self.window:
+            self.spill()
+
+    def spill(self):
+        """Skriv den äldre halvan av fönstret till disk."""
+        count = len(self.timestamps) - self.window // 2
+
+        if self.store is None:
+            self.store = HistoryStore()
+
+        offset = self.store.write(
+            b"".join(
+                RECORD.pack(
+                    self.timestamps[i],
+                    self.kinds[i],
+                    self.amounts[i],
+                    self.counterparties[i],
+                )
+                for i in range(count)
+            )
+        )
+        self.offsets.append(offset)
+        self.starts.append(self.spilled)
+
+        del self.timestamps[:count]
+        del self.kinds[:count]
+        del self.amounts[:count]
+        del self.counterparties[:count]
+
+        self.spilled += count
+
+    def rows(
+        self, start: int, stop: int
+    ) -> list[tuple[float, EventKind, float, int | None]]:
+        """Rader start..stop i kronologisk ordning, oavsett om de ligger på disk eller i minnet."""
+        stop = min(stop, len(self))
+        rows = []
+
+        if start < self.spilled:
+            disk_stop = min(stop, self.spilled)
+
+            # en läsning per block som raderna ligger i
+            i = bisect_right(self.starts, start) - 1
+            while start < disk_stop:
+                end = self.starts[i + 1] if i + 1 < len(self.starts) else self.spilled
+                end = min(end, disk_stop)
+
+                data = self.store.read(
+                    self.offsets[i] + (start - self.starts[i]) * RECORD.size,
+                    (end - start) * RECORD.size,
+                )
+                for timestamp, kind, amount, counterparty in RECORD.iter_unpack(data):
+                    rows.append((timestamp, KINDS[kind], amount, counterparty or None))
+
+                start = end
+                i += 1
+
+        for i in range(start - self.spilled, stop - self.spilled):
+            rows.append(
+                (
+                    self.timestamps[i],
+                    KINDS[self.kinds[i]],
+                    self.amounts[i],
+                    self.counterparties[i] or None,
+                )
+            )
+
+        return rows
+
+    def newest(self, offset: int, count: int):
+        """Rader i omvänd ordning, nyast först, för att visas sida för sida."""
+        stop = len(self) - offset
+        start = max(0, stop - count)
+
+        return reversed(self.rows(start, stop))
+
+    def close(self):
+        """Släpp raderna på disk, t.ex. när kontot stängs.
+
+        Platsen i en delad fil återanvänds inte, den försvinner med filen.
+        """
+        self.spilled = 0
+        self.offsets = array("q")
+        self.starts = array("q")
+        self.store = None
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import time
+
+
+class IdempotencyCache:
+    """
+    nycklar för transaktioner som redan genomförts, så att en transaktion
+    som skickas igen inte görs två gånger
+
+    som mest max_size nycklar sparas, och en nyckel som inte använts på ttl
+    sekunder glöms bort. en träff flyttar nyckeln sist och förlänger den, så
+    ordningen är både LRU-ordning och utgångsordning och bortrensning sker
+    alltid från början i O(1)
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 24 * 60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # key=nyckel, value=när nyckeln går ut
+        self.entries: OrderedDict[str, float] = OrderedDict()
+
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def seen(self, key: str) -> bool:
+        now = time.monotonic()
+        self._evict(now)
+
+        if key not in self.entries:
+            return False
+
+        self.entries[key] = now + self.ttl
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def add(self, key: str):
+        now = time.monotonic()
+
+        self.entries[key] = now + self.ttl
+        self.entries.move_to_end(key)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        while self.entries:
+            key, expires = next(iter(self.entries.items()))
+            if expires > now and len(self.entries) <= self.max_size:
+                break
+            del self.entries[key]
@@ -0,0 +1,396 @@
+from array import array
+from bisect import bisect_left
+import mmap
+import pickle
+import struct
+
+from bank import Account, AccountType, Bank, Customer
+from currency import RateTable
+from lots import LotBook, LotPolicy
+from snapshot import Snapshot
+
+TYPES = list(AccountType)
+POLICIES = list(LotPolicy)
+
+# fält i Account.fields som sparas som kolumner, 0 för konton utan fältet
+FIELD_COLUMNS = {
+    "interest": "d",
+    "return_rate": "d",
+    "standardized_tax": "d",
+    "capital_gains_tax": "d",
+    "capital_gains": "d",
+    "realized_gains": "d",
+    "starting_balance": "d",
+    "yearly_transactions": "d",
+    "quarter_balances": "d",
+    "quarters": "q",
+    "yearly_deposits": "d",
+}
+
+# attribut i AF-kontots LotBook som sparas i kolumnerna lot_*
+LOT_ATTRIBUTES = [
+    "total_amount",
+    "total_basis",
+    "consumed_amount",
+    "consumed_basis",
+    "realized_gains",
+]
+
+# kolumner med ett värde per konto, och deras typ i array
+COLUMNS = {
+    "number": "q",
+    "type": "B",
+    "currency": "B",
+    # 0 = ingen kund, kundnummer börjar på 1
+    "customer": "q",
+    "accrued_month": "q",
+    "balance": "d",
+    **FIELD_COLUMNS,
+    "lot_policy": "B",
+    **{f"lot_{attribute}": "d" for attribute in LOT_ATTRIBUTES},
+}
+
+# kolumner med start (och slut) per konto i en gemensam kolumn, som CSR
+RAGGED = {
+    # kontonamnen i UTF-8 efter varandra
+    "name": ("name_offset", "B"),
+    "lot_amount": ("lot_offset", "d"),
+    "lot_basis": ("lot_offset", "d"),
+    # fenwickträden utan den oanvända första noden
+    "lot_amount_tree": ("lot_offset", "d"),
+    "lot_basis_tree": ("lot_offset", "d"),
+}
+
+OFFSETS = {"name_offset": "q", "lot_offset": "q"}
+
+TYPECODES = {
+    **COLUMNS,
+    **OFFSETS,
+    **{name: typecode for name, (_, typecode) in RAGGED.items()},
+}
+
+# fält som varje kontotyp har, i samma ordning som Account.new_*
+FIELDS = {
+    AccountType.CHECKING: [],
+    AccountType.SAVINGS: ["interest"],
+    AccountType.ISK: [
+        "return_rate",
+        "standardized_tax",
+        "starting_balance",
+        "yearly_transactions",
+        "quarter_balances",
+        "quarters",
+        "yearly_deposits",
+    ],
+    AccountType.AF: [
+        "return_rate",
+        "capital_gains_tax",
+        "capital_gains",
+        "realized_gains",
+    ],
+}
+
+MAGIC = b"BANKIMG1"
+HEADER = struct.Struct("<8sQQ")
+
+# buffertar i filen börjar på jämna 8 byte så att de kan läsas som q och d
+ALIGNMENT = 8
+
+
+class BankImage:
+    """
+    bankens konton sparade kolumnvis, ett saldo eller en parameter för alla
+    konton i en array, så att hela banken kan sparas och läsas in utan att
+    varje konto och dess fields-dict behöver pickle:as för sig
+
+    med pickle protocol 5 skickas kolumnerna som PickleBuffer, som kan
+    skickas utanför själva pickle-strömmen (buffer_callback) utan kopiering.
+    load_image läser filen med mmap, så kolumnerna pekar direkt in i filen
+    och inget konto skapas vid inläsning. Account skapas först när ett konto
+    läses med account(), och sparas då för nästa gång
+    """
+
+    def __init__(self, meta: dict, columns: dict):
+        # bankens klocka, kontonummer, valutor, kunder och valutakurser
+        self.meta = meta
+
+        self.columns = {}
+        for name, buffer in columns.items():
+            # buffertar från pickle är bytes, de tolkas som kolumnens typ
+            view = memoryview(buffer)
+            if view.format != TYPECODES[name]:
+                view = view.cast("B").cast(TYPECODES[name])
+            self.columns[name] = view
+
+        # key=kontonummer, konton som skapats med account()
+        self.views: dict[int, Account] = {}
+
+        # filen som kolumnerna pekar in i, se load_image
+        self.source = None
+
+    def __len__(self) -> int:
+        return len(self.columns["number"])
+
+    def __reduce_ex__(self, protocol):
+        if protocol < 5:
+            columns = {name: column.tobytes() for name, column in self.columns.items()}
+        else:
+            columns = {
+                name: pickle.PickleBuffer(column)
+                for name, column in self.columns.items()
+            }
+
+        return BankImage, (self.meta, columns)
+
+    @property
+    def numbers(self) -> memoryview:
+        return self.columns["number"]
+
+    @property
+    def balances(self) -> memoryview:
+        return self.columns["balance"]
+
+    def totals(self) -> dict[str, float]:
+        """Summan av saldona per valuta, direkt från kolumnerna."""
+        currencies = self.meta["currencies"]
+        totals = {}
+
+        for code, balance in zip(self.columns["currency"], self.columns["balance"]):
+            currency = currencies[code]
+            totals[currency] = totals.get(currency, 0.0) + balance
+
+        return totals
+
+    def _index(self, number: int) -> int | None:
+        # kontona sparas i kontonummerordning
+        numbers = self.columns["number"]
+        i = bisect_left(numbers, number)
+        return i if i < len(numbers) and numbers[i] == number else None
+
+    def _ragged(self, name: str, i: int) -> memoryview:
+        offset, _ = RAGGED[name]
+        offsets = self.columns[offset]
+        return self.columns[name][offsets[i] : offsets[i + 1]]
+
+    def account(self, number: int) -> Account | None:
+        """Kontot med kontonummer number, None om det inte finns.
+
+        Kontot skapas från kolumnerna första gången det läses. Ändringar i
+        det påverkar inte avbildningen.
+        """
+        account = self.views.get(number)
+        if account is not None:
+            return account
+
+        i = self._index(number)
+        if i is None:
+            return None
+
+        account = self._build(i)
+        self.views[number] = account
+        return account
+
+    def _build(self, i: int) -> Account:
+        columns = self.columns
+        type = TYPES[columns["type"][i]]
+
+        fields = {name: columns[name][i] for name in FIELDS[type]}
+
+        if type == AccountType.AF:
+            lots = LotBook(POLICIES[columns["lot_policy"][i]])
+            # frombytes kopierar hela posten på en gång
+            lots.amounts.frombytes(self._ragged("lot_amount", i).cast("B"))
+            lots.bases.frombytes(self._ragged("lot_basis", i).cast("B"))
+            lots.amount_tree.tree.frombytes(
+                self._ragged("lot_amount_tree", i).cast("B")
+            )
+            lots.basis_tree.tree.frombytes(self._ragged("lot_basis_tree", i).cast("B"))
+            for attribute in LOT_ATTRIBUTES:
+                setattr(lots, attribute, columns[f"lot_{attribute}"][i])
+            fields["lots"] = lots
+
+        account = Account(
+            str(self._ragged("name", i), "utf-8"),
+            type,
+            fields,
+            self.meta["currencies"][columns["currency"][i]],
+        )
+        account.number = columns["number"][i]
+        account.balance = columns["balance"][i]
+        account.accrued_month = columns["accrued_month"][i]
+        account.customer = columns["customer"][i] or None
+
+        return account
+
+    def accounts(self):
+        """Alla konton i kontonummerordning, skapas ett i taget."""
+        for number in self.columns["number"]:
+            yield self.account(number)
+
+    def to_bank(self, **kwargs) -> Bank:
+        """En ny Bank med kontona och kunderna, kontonumren behålls.
+
+        kwargs skickas till Bank, rates och lazy_accrual är som standard
+        samma som i banken som sparades.
+        Historik, gränser och stående överföringar sparas inte i avbildningen.
+        """
+        if "rates" not in kwargs:
+            kwargs["rates"] = RateTable(self.meta["base"], self.meta["rates"])
+        kwargs.setdefault("lazy_accrual", self.meta["lazy_accrual"])
+
+        bank = Bank(**kwargs)
+        bank.month = self.meta["month"]
+
+        for number, name in self.meta["customers"]:
+            customer = Customer(name)
+            customer.number = number
+            bank.customers[number] = customer
+            bank.customer_index.add(customer)
+        bank.customer_number = self.meta["customer_number"]
+
+        # kontona skapas här utan att sparas i views
+        for i in range(len(self)):
+            account = self._build(i)
+            accrued_month = account.accrued_month
+            bank._add_account(account.number, account)
+            account.accrued_month = accrued_month
+
+        bank.account_number = self.meta["account_number"]
+        return bank
+
+    def close(self):
+        """Släpp kolumnerna, och filen om avbildningen lästs med load_image."""
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+
+def build_image(bank: Bank, snapshot: Snapshot | None = None) -> BankImage:
+    """Kolumnerna för alla konton i bank, läses från snapshot som i export_accounts."""
+    if snapshot is None:
+        snapshot = bank.snapshot()
+
+    currencies = list(bank.rates.currencies)
+    codes = {currency: i for i, currency in enumerate(currencies)}
+
+    columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+    for name, (_, typecode) in RAGGED.items():
+        columns[name] = array(typecode)
+    for name, typecode in OFFSETS.items():
+        columns[name] = array(typecode, [0])
+
+    try:
+        for account in snapshot.accounts():
+            fields = account.fields
+
+            columns["number"].append(account.number)
+            columns["type"].append(TYPES.index(account.type))
+            columns["currency"].append(codes[account.currency])
+            columns["customer"].append(account.customer or 0)
+            columns["accrued_month"].append(account.accrued_month)
+            columns["balance"].append(account.balance)
+
+            for name in FIELD_COLUMNS:
+                columns[name].append(fields.get(name, 0))
+
+            lots: LotBook | None = fields.get("lots")
+            columns["lot_policy"].append(POLICIES.index(lots.policy) if lots else 0)
+            for attribute in LOT_ATTRIBUTES:
+                columns[f"lot_{attribute}"].append(
+                    getattr(lots, attribute) if lots else 0.0
+                )
+
+            if lots is not None:
+                columns["lot_amount"].extend(lots.amounts)
+                columns["lot_basis"].extend(lots.bases)
+                columns["lot_amount_tree"].extend(lots.amount_tree.tree[1:])
+                columns["lot_basis_tree"].extend(lots.basis_tree.tree[1:])
+
+            columns["lot_offset"].append(len(columns["lot_amount"]))
+
+            columns["name"].frombytes(account.name.encode("utf-8"))
+            columns["name_offset"].append(len(columns["name"]))
+
+        meta = {
+            "month": snapshot.month,
+            "lazy_accrual": bank.lazy_accrual,
+            "account_number": snapshot.account_number,
+            "customer_number": bank.customer_number,
+            "customers": [
+                (customer.number, customer.name) for customer in bank.customers.values()
+            ],
+            "currencies": currencies,
+            "base": bank.rates.base,
+            "rates": {
+                currency: bank.rates.rate(bank.rates.base, currency)
+                for currency in currencies
+            },
+        }
+    finally:
+        snapshot.close()
+
+    return BankImage(meta, columns)
+
+
+def save_image(bank: Bank, path: str, snapshot: Snapshot | None = None) -> int:
+    """Spara bankens konton till path och returnera antal skrivna byte.
+
+    Filen har en kort header, en pickle (protocol 5) med allt utom
+    kolumnerna, och sen kolumnerna som råa buffertar.
+    """
+    image = build_image(bank, snapshot)
+
+    buffers = []
+    data = pickle.dumps(image, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(data), len(raws)))
+        file.write(array("q", [len(raw) for raw in raws]).tobytes())
+        file.write(data)
+
+        for raw in raws:
+            file.write(b"\0" * (-file.tell() % ALIGNMENT))
+            file.write(raw)
+
+        return file.tell()
+
+
+def load_image(path: str) -> BankImage:
+    """Läs en fil från save_image utan att kopiera kolumnerna eller skapa konton.
+
+    Kastar ValueError om filen inte är en sparad bank.
+    """
+    with open(path, "rb") as file:
+        source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(source)
+
+    if len(view) < HEADER.size:
+        raise ValueError("Filen är inte en sparad bank")
+
+    magic, size, count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Filen är inte en sparad bank")
+
+    position = HEADER.size
+    lengths = view[position : position + count * 8].cast("q")
+    position += count * 8
+
+    data = view[position : position + size]
+    position += size
+
+    buffers = []
+    for length in lengths:
+        position += -position % ALIGNMENT
+        buffers.append(view[position : position + length])
+        position += length
+
+    image = pickle.loads(data, buffers=buffers)
+    image.source = source
+
+    return image
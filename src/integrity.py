@@ -0,0 +1,204 @@
+from currency import format_amount
+from ledger import EventKind
+
+# kontrollsummorna räknas modulo 2**64
+MASK = (1 << 64) - 1
+
+
+class IntegrityError(Exception):
+    """Saldona stämmer inte med det som bokförts, meddelandet kan visas för användaren."""
+
+
+def digest(account) -> int:
+    """64-bitars hash av kontots nummer, saldo och fält.
+
+    Fälten hashas i namnordning, så att ett konto som lästs in från en fil
+    ger samma värde. Posterna i ett AF-konto räknas inte med var för sig, de
+    syns i capital_gains och realized_gains. Bara tal hashas, så värdet är
+    samma i alla processer (hash för str slumpas per process).
+    """
+    values = [value for name, value in sorted(account.fields.items()) if name != "lots"]
+    return hash((account.number, account.balance, *values)) & MASK
+
+
+def close(a: float, b: float, scale: float = 0.0) -> bool:
+    # summor av många flyttal blir inte exakt lika, felet växer med beloppen
+    return abs(a - b) <= 1e-6 + 1e-9 * max(abs(a), abs(b), scale)
+
+
+class Checksums:
+    """
+    kontrollsummor över kontona, uppdelade i hinkar om bucket_size
+    kontonummer, och bokförda flöden per valuta
+
+    summan i en hink är summan av digest för dess konton modulo 2**64, så
+    ett konto byts ut genom att dra bort det gamla värdet och lägga till det
+    nya, O(1) utan att läsa de andra kontona. banken anropar update direkt
+    efter varje ändring, så en senare ändring utanför banken räknas aldrig
+    in och syns när summorna jämförs med nyräknade
+
+    summorna av saldona per valuta jämförs med summan av bokförda belopp,
+    och det som dragits från avsändaren vid en överföring ska vara lika
+    mycket värt i basvalutan som det som satts in hos mottagaren. efter en
+    avvikelse kan summorna jämföras med nyräknade (eller med en annan
+    banks) hink för hink i ett träd, där bara grenar som skiljer sig följs
+    """
+
+    def __init__(self, bucket_size: int = 64):
+        self.bucket_size = bucket_size
+
+        # summan av digest per hink, och för alla hinkar
+        self.buckets: list[int] = []
+        self.root = 0
+
+        # key=kontonummer, digest, saldo och valuta när kontot senast hashades
+        self.digests: dict[int, tuple[int, float, str]] = {}
+
+        # key=valuta, summan av de hashade saldona
+        self.balances: dict[str, float] = {}
+        # key=valuta, summan av alla bokförda belopp, dvs. vad saldona borde vara
+        self.expected: dict[str, float] = {}
+        # key=händelsetyp, bokförda belopp per valuta
+        self.flows: dict[EventKind, dict[str, float]] = {}
+        # antal överföringar där mottaget och skickat inte var lika mycket
+        # värda, och summan av skillnaderna i basvalutan
+        self.transfer_errors = 0
+        self.transfer_imbalance = 0.0
+
+    def update(self, account):
+        """Hasha om kontot efter en ändring."""
+        self._replace(
+            account.number, (digest(account), account.balance, account.currency)
+        )
+
+    def record(self, kind: EventKind, currency: str, amount: float):
+        """Bokför att ett saldo ändrats med amount."""
+        self.expected[currency] = self.expected.get(currency, 0.0) + amount
+
+        flows = self.flows.setdefault(kind, {})
+        flows[currency] = flows.get(currency, 0.0) + amount
+
+    def transferred(self, sent: float, received: float, scale: float):
+        """Kontrollera en överföring, det skickade och det mottagna i basvalutan.
+
+        Beloppen är ändringarna av saldona, scale är saldonas storlek i
+        basvalutan eftersom avrundningsfelet i en skillnad växer med den.
+        Varje överföring kontrolleras för sig, så felmarginalen växer inte
+        med antalet överföringar.
+        """
+        # några ulp av saldona, och omräkningen mellan valutor
+        if abs(received - sent) > 1e-6 + 1e-12 * scale:
+            self.transfer_errors += 1
+            self.transfer_imbalance += received - sent
+
+    def _replace(self, number: int, new: tuple[int, float, str] | None):
+        old = self.digests.pop(number, None)
+        bucket = number // self.bucket_size
+
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+
+        change = 0
+        if old is not None:
+            change -= old[0]
+            self.balances[old[2]] -= old[1]
+        if new is not None:
+            change += new[0]
+            self.balances[new[2]] = self.balances.get(new[2], 0.0) + new[1]
+            self.digests[number] = new
+
+        self.buckets[bucket] = (self.buckets[bucket] + change) & MASK
+        self.root = (self.root + change) & MASK
+
+    def remove(self, number: int):
+        """Ta bort ett stängt konto."""
+        self._replace(number, None)
+
+    def verify(self):
+        """Kastar IntegrityError om saldona inte stämmer med det bokförda.
+
+        Kostar en jämförelse per valuta.
+        """
+        for currency in self.balances.keys() | self.expected.keys():
+            balance = self.balances.get(currency, 0.0)
+            expected = self.expected.get(currency, 0.0)
+
+            if not close(balance, expected):
+                raise IntegrityError(
+                    f"Saldona är {format_amount(balance, currency)} men "
+                    f"{format_amount(expected, currency)} har bokförts"
+                )
+
+        if self.transfer_errors:
+            raise IntegrityError(
+                f"Överföringar har ändrat de totala tillgångarna med "
+                f"{format_amount(self.transfer_imbalance, sign=True)} "
+                f"({self.transfer_errors} st)"
+            )
+
+    @staticmethod
+    def build(accounts, bucket_size: int = 64) -> "Checksums":
+        """Kontrollsummor räknade från början över accounts."""
+        checksums = Checksums(bucket_size)
+        for account in accounts:
+            checksums.update(account)
+        return checksums
+
+    def tree(self, size: int) -> list[list[int]]:
+        """Hinkarnas summor och summorna av par av dem, uppåt till roten."""
+        leaves = self.buckets + [0] * (size - len(self.buckets))
+        levels = [leaves]
+
+        while len(levels[-1]) > 1:
+            level = levels[-1]
+            levels.append(
+                [(level[i] + level[i + 1]) & MASK for i in range(0, len(level), 2)]
+            )
+
+        return levels
+
+    def diff(self, other: "Checksums") -> list[tuple[int, int]]:
+        """Kontonummerintervall (första, sista) där summorna skiljer sig från other.
+
+        Träden byggs från hinkarnas summor, sen jämförs de från roten och
+        bara grenar som skiljer sig följs, så varje felaktig hink hittas med
+        O(log n) jämförelser.
+        """
+        if self.bucket_size != other.bucket_size:
+            raise ValueError("Kontrollsummorna har olika hinkstorlek")
+
+        if self.root == other.root:
+            return []
+
+        # lika många hinkar i båda träden, en jämn tvåpotens
+        size = 1
+        while size < max(len(self.buckets), len(other.buckets)):
+            size *= 2
+
+        mine = self.tree(size)
+        theirs = other.tree(size)
+
+        ranges = []
+        # (nivå, index) för grenar som skiljer sig, med roten överst
+        stack = [(len(mine) - 1, 0)]
+
+        while stack:
+            level, i = stack.pop()
+            if mine[level][i] == theirs[level][i]:
+                continue
+
+            if level == 0:
+                first = i * self.bucket_size
+                last = first + self.bucket_size - 1
+
+                # slå ihop med hinken före om de ligger intill varandra
+                if ranges and ranges[-1][1] + 1 == first:
+                    ranges[-1] = (ranges[-1][0], last)
+                else:
+                    ranges.append((first, last))
+            else:
+                # höger först så att vänster tas ut ur stacken först
+                stack.append((level - 1, 2 * i + 1))
+                stack.append((level - 1, 2 * i))
+
+        return ranges
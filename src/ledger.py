@@ -0,0 +1,460 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from enum import Enum, auto
+import lzma
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+
+class EventKind(Enum):
+    OPEN = auto()
+    CLOSE = auto()
+    DEPOSIT = auto()
+    WITHDRAW = auto()
+    TRANSFER = auto()
+    YEARLY_UPDATE = auto()
+    SIMULATION = auto()
+    # läggs sist så att koderna för de andra typerna inte ändras
+    TAX = auto()
+
+
+KINDS = list(EventKind)
+KIND_CODES = {kind: i for i, kind in enumerate(KINDS)}
+
+# en händelse på disk: tidsstämpel, typ, kontonummer, belopp, motpart
+RECORD = struct.Struct("<dBqdq")
+
+# antal händelser som packas mellan varje gång spill släpper GIL
+SPILL_CHUNK = 128
+
+COMPRESSIONS = {
+    "zlib": (zlib.compress, zlib.decompress, ".z"),
+    "lzma": (lzma.compress, lzma.decompress, ".xz"),
+}
+
+
+class Event:
+    """En händelse i huvudboken.
+
+    amount är alltid förändringen av kontots saldo, så att ett saldo kan
+    återskapas genom att summera händelserna. Vid överföringar sparas
+    motpartens kontonummer i counterparty.
+    """
+
+    def __init__(
+        self,
+        seq: int,
+        timestamp: float,
+        kind: EventKind,
+        account_number: int,
+        amount: float,
+        counterparty: int | None = None,
+    ):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.kind = kind
+        self.account_number = account_number
+        self.amount = amount
+        self.counterparty = counterparty
+
+
+def unpack_event(seq: int, record: tuple) -> Event:
+    timestamp, kind, account_number, amount, counterparty = record
+    return Event(
+        seq, timestamp, KINDS[kind], account_number, amount, counterparty or None
+    )
+
+
+class Segment:
+    """Händelserna start..start + count i följd, i minnet eller i en fil."""
+
+    def __init__(self, start: int, timestamp: float):
+        self.start = start
+        # första händelsens tidsstämpel
+        self.timestamp = timestamp
+
+        # None när segmentet bara finns på disk
+        self.events: list[Event] | None = []
+        self.count = 0
+        # key=kontonummer, sekvensnumren för kontots händelser i segmentet och
+        # saldot efter var och en av dem, None när segmentet bara finns på disk
+        self.accounts: dict[int, tuple[array, array]] | None = {}
+
+        self.path: str | None = None
+        # None för okomprimerade filer, som kan läsas post för post
+        self.compression: str | None = None
+
+
+class Ledger:
+    """
+    händelsebaserad huvudbok, händelserna är "source of truth" och saldon
+    kan räknas fram för valfri tidpunkt
+
+    händelserna delas upp i segment om segment_size. nya händelser läggs
+    bara till i det sista segmentet, äldre segment ändras aldrig och packas
+    av compact (oftast från en Compactor i en egen tråd): de skrivs till
+    directory och tas bort ur minnet, och segment äldre än hot_segments
+    komprimeras. segmentindexet (första sekvensnumret per segment) gör att
+    vilken händelse som helst kan hittas med en binärsökning
+
+    för varje konto sparas segmenten där kontot har händelser och saldot
+    efter vart och ett av dem (en checkpoint per konto och segment). segment
+    i minnet har dessutom sekvensnumren och saldona för varje händelse per
+    konto, de släpps när segmentet skrivs till disk. ett saldo bakåt i tiden
+    blir en binärsökning, plus en genomläsning av segmentet om det finns på
+    disk, och historiken läser bara segment där kontot har händelser
+
+    utan directory skrivs segmenten till en temporär katalog som tas bort
+    av close, då sparas ingenting mellan körningar
+
+    append tar aldrig låset, så en insättning väntar aldrig på att ett
+    segment skrivs eller komprimeras
+    """
+
+    def __init__(
+        self,
+        segment_size: int = 4096,
+        directory: str | None = None,
+        compression: str | None = "zlib",
+        hot_segments: int = 2,
+        cache_size: int = 4,
+    ):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"Okänd komprimering: {compression}")
+
+        self.segment_size = segment_size
+        self.compression = compression
+        # antal packade segment närmast slutet som inte komprimeras
+        self.hot_segments = hot_segments
+
+        # utan directory skrivs segmenten till en temporär katalog som inte
+        # finns kvar efter close
+        self.tempdir = None
+        if directory is None:
+            self.tempdir = tempfile.TemporaryDirectory(prefix="ledger-")
+            directory = self.tempdir.name
+        self.directory = directory
+
+        self.segments: list[Segment] = []
+        # första sekvensnumret och tidsstämpeln per segment, för bisect
+        self.starts = array("q")
+        self.timestamps = array("d")
+
+        self.seq = 0
+        self.last_timestamp = 0.0
+
+        # antal segment (från början) som skrivits till disk
+        self.spilled = 0
+        # antal segment (från början) som komprimerats
+        self.compressed = 0
+
+        # key=kontonummer, segmenten där kontot har händelser och kontots
+        # saldo efter vart och ett av dem
+        self.checkpoint_segments: dict[int, array] = {}
+        self.checkpoints: dict[int, array] = {}
+        # key=kontonummer, senaste saldot enligt huvudboken
+        self.balances: dict[int, float] = {}
+
+        # skyddar filerna, som compact byter ut medan andra trådar läser
+        self.lock = threading.Lock()
+        # key=segmentnummer, de senast lästa segmentens poster från disk (LRU)
+        self.cache: OrderedDict[int, bytes] = OrderedDict()
+        self.cache_size = cache_size
+
+    def __len__(self) -> int:
+        return self.seq
+
+    def append(
+        self,
+        kind: EventKind,
+        account_number: int,
+        amount: float,
+        counterparty: int | None = None,
+        timestamp: float | None = None,
+    ) -> Event:
+        if timestamp is None:
+            timestamp = time.time()
+
+        # tidsstämplar måste vara monotona för att bisect ska fungera
+        if timestamp < self.last_timestamp:
+            timestamp = self.last_timestamp
+        self.last_timestamp = timestamp
+
+        segment = self.segments[-1] if self.segments else None
+        if segment is None or segment.count >= self.segment_size:
+            # nytt segment, det gamla ändras inte mer och kan packas
+            segment = Segment(self.seq, timestamp)
+            self.starts.append(segment.start)
+            self.timestamps.append(timestamp)
+            self.segments.append(segment)
+
+        event = Event(self.seq, timestamp, kind, account_number, amount, counterparty)
+        segment.events.append(event)
+        segment.count += 1
+        self.seq += 1
+
+        balance = self.balances.get(account_number, 0.0) + amount
+        self.balances[account_number] = balance
+
+        # saldot före sekvensnumret, så att en läsare som hittar seq alltid
+        # hittar saldot
+        index = segment.accounts.get(account_number)
+        if index is None:
+            index = segment.accounts[account_number] = (array("q"), array("d"))
+        index[1].append(balance)
+        index[0].append(event.seq)
+
+        # checkpointen för segmentet följer med till dess sista händelse
+        i = len(self.segments) - 1
+        segments = self.checkpoint_segments.get(account_number)
+        if segments is None or segments[-1] != i:
+            self.checkpoints.setdefault(account_number, array("d")).append(balance)
+            self.checkpoint_segments.setdefault(account_number, array("q")).append(i)
+        else:
+            self.checkpoints[account_number][-1] = balance
+
+        return event
+
+    def _segment(self, seq: int) -> int:
+        return bisect_right(self.starts, seq) - 1
+
+    def _data(self, i: int) -> bytes:
+        """Segment i:s poster från disk, okomprimerade."""
+        segment = self.segments[i]
+
+        with self.lock:
+            data = self.cache.get(i)
+            if data is not None:
+                self.cache.move_to_end(i)
+                return data
+
+            with open(segment.path, "rb") as file:
+                data = file.read()
+            if segment.compression is not None:
+                data = COMPRESSIONS[segment.compression][1](data)
+
+            self.cache[i] = data
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+            return data
+
+    def event(self, seq: int) -> Event:
+        """Händelse seq, okomprimerade segment på disk läses med en seek."""
+        if not 0 <= seq < self.seq:
+            raise IndexError(seq)
+
+        i = self._segment(seq)
+        segment = self.segments[i]
+
+        events = segment.events
+        if events is not None:
+            return events[seq - segment.start]
+
+        with self.lock:
+            if segment.compression is None and i not in self.cache:
+                with open(segment.path, "rb") as file:
+                    file.seek((seq - segment.start) * RECORD.size)
+                    return unpack_event(seq, RECORD.unpack(file.read(RECORD.size)))
+
+        offset = (seq - segment.start) * RECORD.size
+        return unpack_event(seq, RECORD.unpack_from(self._data(i), offset))
+
+    def seq_at(self, timestamp: float) -> int:
+        """Sekvensnumret för den sista händelsen vid eller före timestamp, -1 om ingen finns."""
+        i = bisect_right(self.timestamps, timestamp) - 1
+        if i < 0:
+            return -1
+
+        segment = self.segments[i]
+        events = segment.events
+
+        if events is not None:
+            count = bisect_right(events, timestamp, key=lambda event: event.timestamp)
+        else:
+            # tidsstämpeln är först i varje post
+            data = self._data(i)
+            count = bisect_right(
+                range(len(data) // RECORD.size),
+                timestamp,
+                key=lambda j: RECORD.unpack_from(data, j * RECORD.size)[0],
+            )
+
+        return segment.start + count - 1
+
+    def balance_as_of(
+        self,
+        account_number: int,
+        seq: int | None = None,
+        timestamp: float | None = None,
+    ) -> float:
+        """Kontots saldo efter händelse seq, eller vid tidpunkten timestamp.
+
+        Utan seq och timestamp returneras det senaste saldot.
+        """
+        if timestamp is not None:
+            seq = self.seq_at(timestamp)
+
+        segments = self.checkpoint_segments.get(account_number)
+        if segments is None:
+            return 0.0
+
+        if seq is None:
+            return self.balances[account_number]
+
+        if seq < 0:
+            return 0.0
+
+        seq = min(seq, self.seq - 1)
+        i = self._segment(seq)
+
+        # senaste segmentet till och med i där kontot har händelser
+        j = bisect_right(segments, i)
+        if j == 0:
+            return 0.0
+        checkpoints = self.checkpoints[account_number]
+        if segments[j - 1] != i:
+            return checkpoints[j - 1]
+
+        # kontot har händelser i segment i, räkna från saldot före det
+        balance = checkpoints[j - 2] if j >= 2 else 0.0
+        segment = self.segments[i]
+
+        accounts = segment.accounts
+        if accounts is not None:
+            seqs, balances = accounts[account_number]
+            count = bisect_right(seqs, seq)
+            return balances[count - 1] if count else balance
+
+        # på disk, summera kontots poster fram till seq
+        data = self._data(i)
+        for record in RECORD.iter_unpack(
+            data[: (seq - segment.start + 1) * RECORD.size]
+        ):
+            if record[2] == account_number:
+                balance += record[3]
+
+        return balance
+
+    def history(self, account_number: int) -> list[Event]:
+        # bara segment där kontot har händelser läses
+        result = []
+
+        for i in self.checkpoint_segments.get(account_number, ()):
+            segment = self.segments[i]
+
+            # hämtas en gång, compact kan släppa dem under tiden
+            events = segment.events
+            accounts = segment.accounts
+
+            if events is not None and accounts is not None:
+                seqs = accounts[account_number][0]
+                result.extend(events[seq - segment.start] for seq in seqs)
+            else:
+                result.extend(
+                    unpack_event(seq, record)
+                    for seq, record in enumerate(
+                        RECORD.iter_unpack(self._data(i)), segment.start
+                    )
+                    if record[2] == account_number
+                )
+
+        return result
+
+    def _path(self, segment: Segment, compression: str | None) -> str:
+        suffix = COMPRESSIONS[compression][2] if compression is not None else ""
+        return os.path.join(self.directory, f"{segment.start:012}.seg{suffix}")
+
+    def spill(self) -> int | None:
+        """Skriv det äldsta fulla segmentet som finns kvar i minnet till disk.
+
+        Returnerar antal skrivna byte, eller None om inget segment behöver skrivas.
+        """
+        # det sista segmentet kan fortfarande få händelser
+        if self.spilled >= len(self.segments) - 1:
+            return None
+
+        segment = self.segments[self.spilled]
+        events = segment.events
+        records = []
+
+        for start in range(0, len(events), SPILL_CHUNK):
+            for event in events[start : start + SPILL_CHUNK]:
+                records.append(
+                    RECORD.pack(
+                        event.timestamp,
+                        KIND_CODES[event.kind],
+                        event.account_number,
+                        event.amount,
+                        event.counterparty or 0,
+                    )
+                )
+
+            # släpp GIL en stund, annars kan append i en annan tråd få vänta
+            # ett helt växlingsintervall (5 ms) på att segmentet blir klart
+            time.sleep(0.0001)
+
+        data = b"".join(records)
+
+        path = self._path(segment, None)
+        with open(path, "wb") as file:
+            file.write(data)
+
+        segment.path = path
+
+        # läsare som redan hämtat listorna läser färdigt från minnet
+        self.spilled += 1
+        segment.events = None
+        segment.accounts = None
+
+        return len(data)
+
+    def compress(self) -> int | None:
+        """Komprimera det äldsta skrivna segmentet utanför de hot_segments senaste.
+
+        Returnerar antal skrivna byte, eller None om inget segment behöver komprimeras.
+        """
+        if self.compression is None:
+            return None
+
+        if self.compressed >= self.spilled - self.hot_segments:
+            return None
+
+        segment = self.segments[self.compressed]
+
+        with open(segment.path, "rb") as file:
+            data = COMPRESSIONS[self.compression][0](file.read())
+
+        path = self._path(segment, self.compression)
+        with open(path, "wb") as file:
+            file.write(data)
+
+        with self.lock:
+            old = segment.path
+            segment.path = path
+            segment.compression = self.compression
+            os.remove(old)
+
+        self.compressed += 1
+
+        return len(data)
+
+    def compact(self, written=None):
+        """Skriv och komprimera alla segment som kan packas.
+
+        written anropas med antal byte efter varje skrivning, t.ex. för att
+        begränsa hur fort det skrivs.
+        """
+        for step in (self.spill, self.compress):
+            while (size := step()) is not None:
+                if written is not None:
+                    written(size)
+
+    def close(self):
+        if self.tempdir is not None:
+            self.tempdir.cleanup()
@@ -0,0 +1,171 @@
+from array import array
+from enum import Enum
+
+
+class LotPolicy(Enum):
+    FIFO = "Först in, först ut"
+    AVERAGE = "Genomsnittsmetoden"
+
+
+class Fenwick:
+    """Fenwickträd (binary indexed tree) över värden som bara läggs till i slutet."""
+
+    def __init__(self):
+        # 1-indexerat, tree[0] används inte
+        self.tree = array("d", [0.0])
+
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+
+    def append(self, value: float):
+        i = len(self.tree)
+        lowbit = i & -i
+
+        # noden täcker (i - lowbit, i], resten av intervallet finns redan
+        self.tree.append(value + self.prefix(i - 1) - self.prefix(i - lowbit))
+
+    def add(self, i: int, value: float):
+        """Öka värde nummer i (från 0) med value."""
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += value
+            i += i & -i
+
+    def prefix(self, i: int) -> float:
+        """Summan av de i första värdena."""
+        total = 0.0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def search(self, target: float) -> tuple[int, float]:
+        """Största i där prefix(i) < target, och hur mycket av target som återstår efter den."""
+        i = 0
+        step = 1 << (len(self).bit_length() - 1) if len(self) else 0
+
+        while step:
+            if i + step <= len(self) and self.tree[i + step] < target:
+                i += step
+                target -= self.tree[i]
+            step >>= 1
+
+        return i, target
+
+
+class LotBook:
+    """
+    anskaffningsvärde per post (lot) för ett aktie- och fondkonto
+
+    varje insättning blir en post med anskaffningsvärdet lika med beloppet,
+    och varje års avkastning blir en post med anskaffningsvärdet noll. uttag
+    förbrukar posterna i ordning (FIFO) eller enligt genomsnittsmetoden
+
+    med FIFO hittas var uttaget tar slut med en sökning i ett fenwickträd,
+    så ett uttag kostar O(log n) oavsett hur många poster kontot har
+    """
+
+    def __init__(self, policy: LotPolicy = LotPolicy.FIFO):
+        self.policy = policy
+
+        # belopp och anskaffningsvärde per post
+        self.amounts = array("d")
+        self.bases = array("d")
+
+        # prefixsummor över posterna
+        self.amount_tree = Fenwick()
+        self.basis_tree = Fenwick()
+
+        self.total_amount = 0.0
+        self.total_basis = 0.0
+
+        # förbrukat belopp och anskaffningsvärde räknat från första posten
+        self.consumed_amount = 0.0
+        self.consumed_basis = 0.0
+
+        self.realized_gains = 0.0
+
+    def copy(self) -> "LotBook":
+        lots = LotBook(self.policy)
+        lots.amounts = array("d", self.amounts)
+        lots.bases = array("d", self.bases)
+        lots.amount_tree.tree = array("d", self.amount_tree.tree)
+        lots.basis_tree.tree = array("d", self.basis_tree.tree)
+        lots.total_amount = self.total_amount
+        lots.total_basis = self.total_basis
+        lots.consumed_amount = self.consumed_amount
+        lots.consumed_basis = self.consumed_basis
+        lots.realized_gains = self.realized_gains
+        return lots
+
+    @property
+    def remaining_amount(self) -> float:
+        return self.total_amount - self.consumed_amount
+
+    @property
+    def remaining_basis(self) -> float:
+        return self.total_basis - self.consumed_basis
+
+    @property
+    def unrealized_gains(self) -> float:
+        return self.remaining_amount - self.remaining_basis
+
+    def add(self, amount: float, basis: float):
+        if amount <= 0.0:
+            return
+
+        self.amounts.append(amount)
+        self.bases.append(basis)
+        self.amount_tree.append(amount)
+        self.basis_tree.append(basis)
+
+        self.total_amount += amount
+        self.total_basis += basis
+
+    def _basis(self, amount: float) -> float:
+        # anskaffningsvärdet för de amount som står på tur, amount får inte
+        # vara större än det som finns kvar
+        match self.policy:
+            case LotPolicy.FIFO:
+                target = self.consumed_amount + amount
+
+                # posten där uttaget tar slut, ta med en andel av den
+                i, rest = self.amount_tree.search(target)
+                basis = self.basis_tree.prefix(i)
+                if i < len(self.amounts):
+                    basis += rest * self.bases[i] / self.amounts[i]
+
+                return max(0.0, min(basis, self.total_basis) - self.consumed_basis)
+
+            case LotPolicy.AVERAGE:
+                return amount * self.remaining_basis / self.remaining_amount
+
+    def gains(self, amount: float) -> float:
+        """Vinsten som consume(amount) skulle realisera, utan att förbruka något."""
+        uncovered = max(0.0, amount - self.remaining_amount)
+        amount -= uncovered
+        if amount <= 0.0:
+            return uncovered
+
+        return amount - self._basis(amount) + uncovered
+
+    def consume(self, amount: float) -> float:
+        """Förbruka amount från posterna och returnera den realiserade vinsten.
+
+        Belopp som inte täcks av några poster har inget känt anskaffningsvärde
+        och räknas som vinst.
+        """
+        uncovered = max(0.0, amount - self.remaining_amount)
+        amount -= uncovered
+        if amount <= 0.0:
+            self.realized_gains += uncovered
+            return uncovered
+
+        basis_consumed = self._basis(amount)
+
+        self.consumed_amount += amount
+        self.consumed_basis += basis_consumed
+
+        gains = amount - basis_consumed + uncovered
+        self.realized_gains += gains
+        return gains
@@ -0,0 +1,234 @@
+from bisect import bisect_left, insort
+
+from lots import Fenwick
+
+
+class RankedKeys:
+    """
+    sorterad lista uppdelad i hinkar som SortedKeys i search.py, där antal
+    element per hink också ligger i ett fenwickträd. positionen för en
+    nyckel och nyckeln på en position hittas då med en sökning i trädet
+    och en bisect i hinken, O(log n), utan att räkna igenom hinkarna före
+    """
+
+    LOAD = 500
+
+    def __init__(self):
+        self.buckets: list[list] = []
+        # största elementet i varje hink
+        self.maxes: list = []
+        # antal element per hink
+        self.counts = Fenwick()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _recount(self):
+        # hinkarna har delats eller tagits bort, positionerna i trädet ändras
+        self.counts = Fenwick()
+        for bucket in self.buckets:
+            self.counts.append(len(bucket))
+
+    def add(self, key):
+        self.size += 1
+
+        if not self.buckets:
+            self.buckets.append([key])
+            self.maxes.append(key)
+            self.counts.append(1)
+            return
+
+        i = min(bisect_left(self.maxes, key), len(self.buckets) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, key)
+        self.maxes[i] = bucket[-1]
+        self.counts.add(i, 1)
+
+        # dela hinken när den blivit för stor
+        if len(bucket) > 2 * RankedKeys.LOAD:
+            self.buckets.insert(i + 1, bucket[RankedKeys.LOAD :])
+            del bucket[RankedKeys.LOAD :]
+            self.maxes.insert(i, bucket[-1])
+            self._recount()
+
+    def remove(self, key) -> bool:
+        i = bisect_left(self.maxes, key)
+        if i == len(self.buckets):
+            return False
+
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            return False
+
+        del bucket[j]
+        self.size -= 1
+
+        if bucket:
+            self.maxes[i] = bucket[-1]
+            self.counts.add(i, -1)
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+            self._recount()
+
+        return True
+
+    def replace(self, key, new) -> bool:
+        """Byt ut key mot new, samma som remove(key) och add(new)."""
+        i = bisect_left(self.maxes, key)
+        if i == len(self.buckets):
+            return False
+
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            return False
+
+        # oftast hamnar new i samma hink, då ändras inga antal
+        if min(bisect_left(self.maxes, new), len(self.buckets) - 1) == i:
+            del bucket[j]
+            insort(bucket, new)
+            self.maxes[i] = bucket[-1]
+            return True
+
+        self.remove(key)
+        self.add(new)
+        return True
+
+    def rank(self, key) -> int | None:
+        """Positionen för key, None om den inte finns."""
+        i = bisect_left(self.maxes, key)
+        if i == len(self.buckets):
+            return None
+
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            return None
+
+        return int(self.counts.prefix(i)) + j
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        # hinken där position index finns, och positionen i hinken
+        i, rest = self.counts.search(index + 1)
+        return i, int(rest) - 1
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+
+        i, j = self._locate(index)
+        return self.buckets[i][j]
+
+    def slice(self, start: int, stop: int) -> list:
+        """Nycklarna på position start..stop."""
+        start = max(start, 0)
+        stop = min(stop, self.size)
+        if start >= stop:
+            return []
+
+        i, j = self._locate(start)
+        keys = []
+
+        while len(keys) < stop - start:
+            bucket = self.buckets[i]
+            keys.extend(bucket[j : j + stop - start - len(keys)])
+            i, j = i + 1, 0
+
+        return keys
+
+    def iter_from(self, key):
+        """Nycklarna i ordning, med början från den första som är >= key."""
+        i = bisect_left(self.maxes, key)
+
+        if i < len(self.buckets):
+            bucket = self.buckets[i]
+            yield from bucket[bisect_left(bucket, key) :]
+
+            for bucket in self.buckets[i + 1 :]:
+                yield from bucket
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            yield from bucket
+
+
+class BalanceIndex:
+    """
+    kontonummer sorterade efter saldo, för topplistor, placering och
+    intervall utan att sortera alla konton
+
+    nyckeln är (saldo, kontonummer) så att konton med samma saldo ändå har
+    en bestämd ordning. saldon i olika valutor jämförs i basvalutan
+    """
+
+    def __init__(self):
+        self.list = RankedKeys()
+        # key=kontonummer, saldot som kontot ligger på i listan
+        self.balances: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.list)
+
+    def __contains__(self, number: int) -> bool:
+        return number in self.balances
+
+    def update(self, number: int, balance: float):
+        """Lägg till kontot eller flytta det till sitt nya saldo."""
+        old = self.balances.get(number)
+        if old == balance:
+            return
+
+        if old is None:
+            self.list.add((balance, number))
+        else:
+            self.list.replace((old, number), (balance, number))
+
+        self.balances[number] = balance
+
+    def remove(self, number: int):
+        balance = self.balances.pop(number, None)
+        if balance is not None:
+            self.list.remove((balance, number))
+
+    def rank(self, number: int, descending: bool = True) -> int | None:
+        """Kontots placering från 0, störst saldo först om descending."""
+        balance = self.balances.get(number)
+        if balance is None:
+            return None
+
+        rank = self.list.rank((balance, number))
+        return len(self.list) - 1 - rank if descending else rank
+
+    def slice(self, start: int, stop: int, descending: bool = True) -> list[int]:
+        """Kontonumren på placering start..stop."""
+        if not descending:
+            return [number for _, number in self.list.slice(start, stop)]
+
+        size = len(self.list)
+        keys = self.list.slice(size - min(stop, size), size - max(start, 0))
+        return [number for _, number in reversed(keys)]
+
+    def top(self, n: int) -> list[int]:
+        """De n kontona med störst saldo, störst först."""
+        return self.slice(0, n)
+
+    def bottom(self, n: int) -> list[int]:
+        """De n kontona med minst saldo, minst först."""
+        return self.slice(0, n, descending=False)
+
+    def between(self, low: float, high: float) -> list[int]:
+        """Kontonumren med low <= saldo <= high, minst saldo först."""
+        numbers = []
+
+        # kontonummer börjar på 1, så (low, 0) kommer före alla med saldot low
+        for balance, number in self.list.iter_from((low, 0)):
+            if balance > high:
+                break
+            numbers.append(number)
+
+        return numbers
@@ -0,0 +1,166 @@
+from collections.abc import MutableMapping
+
+from bank import Account, AccountType, Bank
+from ledger import EventKind
+
+
+class Overlay(MutableMapping):
+    """
+    konton i en sandlåda: ändrade och nya konton ligger i changed, resten
+    läses direkt från den riktiga bankens dict utan att kopieras
+    """
+
+    def __init__(self, base: dict[int, Account]):
+        self.base = base
+        self.changed: dict[int, Account] = {}
+        self.deleted: set[int] = set()
+
+    def __getitem__(self, number: int) -> Account:
+        if number in self.deleted:
+            raise KeyError(number)
+
+        account = self.changed.get(number)
+        return account if account is not None else self.base[number]
+
+    def __setitem__(self, number: int, account: Account):
+        self.changed[number] = account
+        self.deleted.discard(number)
+
+    def __delitem__(self, number: int):
+        if number not in self:
+            raise KeyError(number)
+
+        self.changed.pop(number, None)
+        if number in self.base:
+            self.deleted.add(number)
+
+    def __contains__(self, number) -> bool:
+        return number not in self.deleted and (
+            number in self.changed or number in self.base
+        )
+
+    def __iter__(self):
+        for number in self.base:
+            if number not in self.deleted:
+                yield number
+
+        for number in self.changed:
+            if number not in self.base:
+                yield number
+
+    def __len__(self) -> int:
+        new = sum(1 for number in self.changed if number not in self.base)
+        return len(self.base) - len(self.deleted) + new
+
+
+class Sandbox(Bank):
+    """
+    "tänk om"-vy av en bank för simuleringar och scenarion
+
+    att skapa en sandlåda kostar lika mycket oavsett bankens storlek, ett
+    konto kopieras först när sandlådan ändrar det (copy-on-write). inget
+    loggas och ingen notifieras förrän sandlådan verkställs med commit()
+    """
+
+    def __init__(self, bank: Bank):
+        super().__init__()
+        self.bank = bank
+
+        self.accounts = Overlay(bank.accounts)
+        self.account_number = bank.account_number
+
+        # konton med nummer från och med detta skapades i sandlådan
+        self.first_number = bank.account_number
+
+        self.month = bank.month
+        self.lazy_accrual = bank.lazy_accrual
+        self.rates = bank.rates
+
+        # sandlådan ändrar bara några konton, ett index eller kontrollsummor
+        # över dem säger inget
+        self.ranking = None
+        self.integrity = None
+
+        # kopierade konton behåller bankens versioner
+        self.version = bank.version
+
+        # delas med banken tills sandlådan flyttar fram klockan
+        self.scheduler = bank.scheduler
+
+    def advance(self, months: int = 1):
+        self._own_scheduler()
+        super().advance(months)
+
+    def add_standing_order(self, *args, **kwargs):
+        self._own_scheduler()
+        return super().add_standing_order(*args, **kwargs)
+
+    def _own_scheduler(self):
+        if self.scheduler is self.bank.scheduler:
+            self.scheduler = self.bank.scheduler.copy()
+
+    def accounts_of_type(self, type: AccountType):
+        for number in self.bank.accounts_by_type[type]:
+            if number in self.accounts:
+                yield self.accounts[number]
+
+        # konton som skapats i sandlådan
+        yield from self.accounts_by_type[type].values()
+
+    def _writable(self, account: Account) -> Account:
+        changed = self.accounts.changed.get(account.number)
+
+        # första ändringen, kopiera från banken
+        if changed is None and account.number in self.accounts.base:
+            changed = account.copy()
+            self.accounts.changed[account.number] = changed
+
+        return super()._writable(changed if changed is not None else account)
+
+    def commit(self):
+        """Skriv sandlådans ändringar till banken.
+
+        Konton som banken ändrat under tiden skrivs över av sandlådans version.
+        """
+        bank = self.bank
+
+        for number in self.accounts.deleted:
+            bank.delete_account(number)
+
+        for number, changed in self.accounts.changed.items():
+            if number >= self.first_number:
+                # nytt konto i sandlådan, får ett nytt nummer i banken
+                account = Account(
+                    changed.name, changed.type, dict(changed.fields), changed.currency
+                )
+                bank.register_account(account, bank.customers.get(changed.customer))
+            else:
+                account = bank.accounts.get(number)
+
+                # raderat i banken sedan sandlådan skapades
+                if account is None:
+                    continue
+
+            bank.apply_state(
+                account,
+                changed.balance,
+                changed.fields,
+                EventKind.SIMULATION,
+                changed.accrued_month,
+            )
+
+        # tiden som simulerats har passerat även i banken, och de stående
+        # överföringar som gjorts ska inte göras igen
+        bank.month = max(bank.month, self.month)
+        bank.scheduler = self.scheduler
+
+        self.discard()
+
+    def discard(self):
+        self.accounts = Overlay(self.bank.accounts)
+        self.account_number = self.bank.account_number
+        self.first_number = self.bank.account_number
+        self.month = self.bank.month
+        self.version = self.bank.version
+        self.scheduler = self.bank.scheduler
+        self.accounts_by_type = {type: {} for type in AccountType}
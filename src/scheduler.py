@@ -0,0 +1,127 @@
+from collections import deque
+import heapq
+
+
+class StandingOrder:
+    """Stående överföring som görs var interval:e månad, första gången month."""
+
+    def __init__(
+        self,
+        id: int,
+        account_from: int,
+        account_to: int,
+        amount: float,
+        interval: int,
+        month: int,
+    ):
+        self.id = id
+        self.account_from = account_from
+        self.account_to = account_to
+        self.amount = amount
+        self.interval = interval
+
+        # månad då överföringen ska göras nästa gång
+        self.month = month
+
+        self.executions = 0
+        self.failures = 0
+        self.cancelled = False
+
+    def copy(self) -> "StandingOrder":
+        order = StandingOrder(
+            self.id,
+            self.account_from,
+            self.account_to,
+            self.amount,
+            self.interval,
+            self.month,
+        )
+        order.executions = self.executions
+        order.failures = self.failures
+        order.cancelled = self.cancelled
+        return order
+
+
+class Scheduler:
+    """
+    stående överföringar i en prioritetskö (heap) sorterad på nästa månad
+
+    när klockan flyttas fram plockas bara de överföringar som ska göras, så
+    arbetet beror på antal genomförda överföringar och inte på antal konton
+    eller månader
+    """
+
+    def __init__(self, max_failures: int = 1000):
+        # (månad, id, överföring), id gör ordningen stabil
+        self.heap: list[tuple[int, int, StandingOrder]] = []
+        # key=id
+        self.orders: dict[int, StandingOrder] = {}
+        self.next_id = 1
+
+        # de senaste misslyckade överföringarna: (månad, id, orsak)
+        self.failures: deque[tuple[int, int, str]] = deque(maxlen=max_failures)
+
+    def copy(self) -> "Scheduler":
+        scheduler = Scheduler(self.failures.maxlen)
+        scheduler.orders = {id: order.copy() for id, order in self.orders.items()}
+        scheduler.heap = [
+            (month, id, scheduler.orders[id])
+            for month, id, _ in self.heap
+            if id in scheduler.orders
+        ]
+        heapq.heapify(scheduler.heap)
+        scheduler.next_id = self.next_id
+        scheduler.failures.extend(self.failures)
+        return scheduler
+
+    def add(
+        self,
+        account_from: int,
+        account_to: int,
+        amount: float,
+        interval: int,
+        month: int,
+    ) -> StandingOrder:
+        order = StandingOrder(
+            self.next_id, account_from, account_to, amount, interval, month
+        )
+        self.next_id += 1
+
+        self.orders[order.id] = order
+        heapq.heappush(self.heap, (order.month, order.id, order))
+        return order
+
+    def cancel(self, id: int) -> bool:
+        # ligger kvar i heapen tills den plockas, men görs inte
+        order = self.orders.pop(id, None)
+        if order is None:
+            return False
+
+        order.cancelled = True
+        return True
+
+    def next_month(self) -> int | None:
+        """Månaden för nästa överföring som inte tagits bort."""
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+
+        return self.heap[0][0] if self.heap else None
+
+    def pop_batch(self, month: int) -> list[StandingOrder]:
+        """Plocka alla överföringar som ska göras senast month."""
+        batch = []
+
+        while self.heap and self.heap[0][0] <= month:
+            _, _, order = heapq.heappop(self.heap)
+            if not order.cancelled:
+                batch.append(order)
+
+        return batch
+
+    def reschedule(self, order: StandingOrder):
+        order.month += order.interval
+        heapq.heappush(self.heap, (order.month, order.id, order))
+
+    def record_failure(self, order: StandingOrder, month: int, reason: str):
+        order.failures += 1
+        self.failures.append((month, order.id, reason))
@@ -2,21 +2,100 @@ from textual.app import ComposeResult
 from textual.widgets import Button, Label, DataTable
 from textual.containers import Center, Container, Horizontal, Vertical
 from textual.screen import Screen
+from datetime import datetime
 from typing import Any
 
 from bank import Account, AccountType
+from currency import format_amount
+from ledger import EventKind
 from screen.transaction import TransactionScreen, TransactionType
 
+KIND_LABELS = {
+    EventKind.OPEN: "Öppnat",
+    EventKind.CLOSE: "Stängt",
+    EventKind.DEPOSIT: "Insättning",
+    EventKind.WITHDRAW: "Uttag",
+    EventKind.TRANSFER: "Överföring",
+    EventKind.YEARLY_UPDATE: "Årsuppdatering",
+    EventKind.SIMULATION: "Simulering",
+    EventKind.TAX: "Skatt",
+}
+
+
+class HistoryTable(DataTable):
+    """Transaktionshistorik, nyast först, som hämtar rader sida för sida när användaren scrollar."""
+
+    PAGE_SIZE = 50
+
+    def __init__(self, account: Account, **kwargs):
+        super().__init__(cursor_type="row", **kwargs)
+        self.account = account
+
+        # antal rader i historiken när tabellen laddades om, och antal visade
+        self.total = 0
+        self.loaded = 0
+
+        self.add_columns("Datum", "Typ", "Belopp", "Motpart")
+
+    def reload(self):
+        history = self.account.history
+
+        if history is not None and self.total == len(history) and self.loaded:
+            return
+
+        self.clear()
+        self.total = len(history) if history is not None else 0
+        self.loaded = 0
+        self.load_page()
+
+    def load_page(self):
+        history = self.account.history
+        if history is None or self.loaded >= self.total:
+            return
+
+        # nya transaktioner sedan reload hamnar före de redan visade
+        offset = len(history) - self.total + self.loaded
+
+        for timestamp, kind, amount, counterparty in history.newest(
+            offset, min(self.PAGE_SIZE, self.total - self.loaded)
+        ):
+            self.add_row(
+                datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M"),
+                KIND_LABELS[kind],
+                format_amount(amount, self.account.currency, sign=True),
+                f"{counterparty:010}" if counterparty else "",
+            )
+            self.loaded += 1
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+
+        # hämta nästa sida när man närmar sig slutet
+        if new_value >= self.max_scroll_y - self.PAGE_SIZE // 2:
+            self.load_page()
+
 
 class AccountDashboardScreen(Screen[Any]):
     def __init__(self, account: Account):
         super().__init__()
         self.account = account
 
+        # ändringar som ännu inte visats
+        self.pending_changes: set[str] = set()
+
+    def on_mount(self) -> None:
+        self.account.subscribe(self.account_changed)
+
+    def on_unmount(self) -> None:
+        self.account.unsubscribe(self.account_changed)
+
     def on_screen_resume(self) -> None:
-        self.refresh_table()
+        # uppdatera kontot om klockan flyttats fram, ändringar notifieras
+        self.app.bank.read_account(self.account)
 
     def compose(self) -> ComposeResult:
+        self.app.bank.read_account(self.account)
+
         with Center():
             content = Container(classes="content")
             content.border_title = "Konto"
@@ -24,12 +103,19 @@ class AccountDashboardScreen(Screen[Any]):
             with content:
                 self.table = DataTable(show_header=False, cursor_type="row")
                 self.table.can_focus = False
-                self.table.add_columns("", "")
+                self.table.add_column("", key="label")
+                self.table.add_column("", key="value")
 
-                self.refresh_table()
+                self.fill_table()
 
                 yield self.table
 
+                self.history_table = HistoryTable(
+                    self.account, id="account-dashboard-history-table"
+                )
+                self.history_table.reload()
+                yield self.history_table
+
                 if self.account.type == AccountType.CHECKING:
                     yield Button(
                         "Sätt in",
@@ -151,48 +237,88 @@ class AccountDashboardScreen(Screen[Any]):
                     )
                 )
 
-    def refresh_table(self):
-        self.table.clear()
-
-        self.table.add_rows(
-            [
-                ("Kontonamn", self.account.name),
-                ("Saldo", f"{self.account.balance:.2f} kr"),
-                ("Kontotyp", self.account.type.value),
-                ("Kontonummer", f"{self.account.number:010}"),
-            ]
-        )
+    def field_rows(self) -> list[tuple[str, str, str]]:
+        """(nyckel, rubrik, värde) för kontotypens extra fält."""
+        fields = self.account.fields
 
         match self.account.type:
             case AccountType.SAVINGS:
-                self.table.add_rows(
-                    [("Ränta", f"{self.account.fields['interest']:.1%}")]
-                )
+                return [("interest", "Ränta", f"{fields['interest']:.1%}")]
 
             case AccountType.ISK:
-                self.table.add_rows(
-                    [
-                        (
-                            "Årlig avkastning",
-                            f"{self.account.fields['return_rate']:.1%}",
-                        ),
-                        (
-                            "Schablonskatt",
-                            f"{self.account.fields['standardized_tax']:.1%}",
-                        ),
-                    ]
-                )
+                return [
+                    (
+                        "return_rate",
+                        "Årlig avkastning",
+                        f"{fields['return_rate']:.1%}",
+                    ),
+                    (
+                        "standardized_tax",
+                        "Schablonskatt",
+                        f"{fields['standardized_tax']:.1%}",
+                    ),
+                ]
 
             case AccountType.AF:
-                self.table.add_rows(
-                    [
-                        (
-                            "Årlig avkastning",
-                            f"{self.account.fields['return_rate']:.1%}",
-                        ),
-                        (
-                            "Kapitalvinstskatt",
-                            f"{self.account.fields['capital_gains_tax']:.1%}",
-                        ),
-                    ]
-                )
+                return [
+                    (
+                        "return_rate",
+                        "Årlig avkastning",
+                        f"{fields['return_rate']:.1%}",
+                    ),
+                    (
+                        "capital_gains_tax",
+                        "Kapitalvinstskatt",
+                        f"{fields['capital_gains_tax']:.1%}",
+                    ),
+                    (
+                        "realized_gains",
+                        "Realiserad vinst",
+                        format_amount(fields["realized_gains"], self.account.currency),
+                    ),
+                    (
+                        "capital_gains",
+                        "Orealiserad vinst",
+                        format_amount(fields["capital_gains"], self.account.currency),
+                    ),
+                ]
+
+        return []
+
+    def fill_table(self):
+        self.table.add_row("Kontonamn", self.account.name, key="name")
+        self.table.add_row(
+            "Saldo",
+            format_amount(self.account.balance, self.account.currency),
+            key="balance",
+        )
+        self.table.add_row("Kontotyp", self.account.type.value, key="type")
+        self.table.add_row("Kontonummer", f"{self.account.number:010}", key="number")
+
+        for key, label, value in self.field_rows():
+            self.table.add_row(label, value, key=key)
+
+    def account_changed(self, account: Account, changes: set[str]):
+        # samla ändringar och uppdatera tabellerna en gång per frame
+        if not self.pending_changes:
+            self.call_after_refresh(self.apply_changes)
+
+        self.pending_changes |= changes
+
+    def apply_changes(self):
+        changes = self.pending_changes
+        self.pending_changes = set()
+
+        # uppdatera bara de celler som påverkats
+        if "balance" in changes:
+            self.table.update_cell(
+                "balance",
+                "value",
+                format_amount(self.account.balance, self.account.currency),
+            )
+
+        if "fields" in changes:
+            for key, _, value in self.field_rows():
+                self.table.update_cell(key, "value", value)
+
+        self.history_table.reload()
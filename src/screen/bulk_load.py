@@ -0,0 +1,112 @@
+import os
+
+from textual import work
+from textual.app import ComposeResult
+from textual.widgets import Button, Input, Label, ProgressBar
+from textual.containers import Center, Container, Horizontal
+from textual.screen import Screen
+from textual.worker import get_current_worker
+from typing import Any
+
+from bank import Account
+from bulk_load import BulkLoader
+
+
+class BulkLoadScreen(Screen[Any]):
+    def __init__(self):
+        super().__init__()
+
+    def compose(self) -> ComposeResult:
+        with Center():
+            content = Container(classes="content")
+            content.border_title = "Importera konton"
+
+            with content:
+                path = Input(
+                    placeholder="Sökväg till .csv eller .jsonl...",
+                    id="bulk-load-path-input",
+                )
+                path.border_title = "Fil"
+                yield path
+
+                self.progress_bar = ProgressBar(
+                    total=100, show_eta=False, id="bulk-load-progress-bar"
+                )
+                yield self.progress_bar
+
+                self.status_label = Label("", classes="margin-bottom")
+                yield self.status_label
+
+                with Horizontal():
+                    yield Button(
+                        "Tillbaka",
+                        id="bulk-load-back-button",
+                        variant="default",
+                        flat=True,
+                    )
+                    yield Button(
+                        "Importera",
+                        id="bulk-load-start-button",
+                        classes="margin-left",
+                        variant="primary",
+                        flat=True,
+                    )
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        match event.button.id:
+            case "bulk-load-back-button":
+                # avbryter en pågående import, redan registrerade konton finns kvar
+                self.workers.cancel_all()
+                self.app.pop_screen()
+
+            case "bulk-load-start-button":
+                path = self.query_one("#bulk-load-path-input", Input).value.strip()
+
+                if not os.path.isfile(path):
+                    self.notify("Filen finns inte", severity="warning")
+                    return
+
+                event.button.disabled = True
+                self.load(path)
+
+    @work(thread=True, exclusive=True)
+    def load(self, path: str):
+        # filen läses i en egen tråd, kontona registreras i appens tråd
+        loader = BulkLoader(
+            path, batch_size=2000, currencies=self.app.bank.rates.currencies
+        )
+        worker = get_current_worker()
+
+        for batch in loader.batches():
+            if worker.is_cancelled:
+                return
+
+            self.app.call_from_thread(self.register_batch, loader, batch)
+
+        self.app.call_from_thread(self.finished, loader)
+
+    def register_batch(self, loader: BulkLoader, batch: list[Account]):
+        self.app.bank.register_accounts(batch, self.app.customer)
+
+        self.progress_bar.update(progress=loader.progress * 100)
+        self.status_label.update(
+            f"{loader.loaded} konton, {loader.rejected} ogiltiga rader "
+            f"({loader.rows_per_second:.0f} rader/s)"
+        )
+
+    def finished(self, loader: BulkLoader):
+        self.progress_bar.update(progress=100)
+        self.status_label.update(
+            f"{loader.loaded} konton, {loader.rejected} ogiltiga rader "
+            f"({loader.rows_per_second:.0f} rader/s)"
+        )
+        self.query_one("#bulk-load-start-button", Button).disabled = False
+
+        if loader.errors:
+            line, message = loader.errors[0]
+            self.notify(
+                f"{loader.rejected} rader kunde inte läsas, t.ex. rad {line}: {message}",
+                severity="warning",
+            )
+        else:
+            self.notify(f"{loader.loaded} konton importerades", severity="information")
@@ -6,6 +6,9 @@ from textual.screen import Screen
 from typing import Any
 
 from bank import Account, AccountType
+from currency import BASE
+from screen.bulk_load import BulkLoadScreen
+from validation import validate_percentage_input
 
 
 class CreateAccountScreen(Screen[Any]):
@@ -37,6 +40,19 @@ class CreateAccountScreen(Screen[Any]):
                 type_select.border_title = "Kontotyp"
                 yield type_select
 
+                currency_select = Select(
+                    [
+                        (currency, currency)
+                        for currency in self.app.bank.rates.currencies
+                    ],
+                    value=BASE,
+                    allow_blank=False,
+                    id="create-account-currency-select",
+                    compact=True,
+                )
+                currency_select.border_title = "Valuta"
+                yield currency_select
+
                 self.container = Container(
                     id="create-account-dynamic-content-container"
                 )
@@ -49,6 +65,13 @@ class CreateAccountScreen(Screen[Any]):
                         variant="default",
                         flat=True,
                     )
+                    yield Button(
+                        "Importera...",
+                        id="create-account-import-button",
+                        classes="margin-left",
+                        variant="default",
+                        flat=True,
+                    )
                     yield Button(
                         "Skapa",
                         id="create-account-create-button",
@@ -57,7 +80,7 @@ class CreateAccountScreen(Screen[Any]):
                         flat=True,
                     )
 
-    @on(Select.Changed)
+    @on(Select.Changed, "#create-account-account-type-select")
     def select_changed(self, event: Select.Changed) -> None:
         self.container.remove_children()
 
@@ -104,19 +127,16 @@ class CreateAccountScreen(Screen[Any]):
 
     @staticmethod
     def validate_percentage_input(input: str) -> float | None:
-        try:
-            percentage = float(input)
-            if percentage < 0.0:
-                return None
-            return percentage
-        except ValueError:
-            return None
+        return validate_percentage_input(input)
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         match event.button.id:
             case "create-account-cancel-button":
                 self.app.pop_screen()
 
+            case "create-account-import-button":
+                self.app.push_screen(BulkLoadScreen())
+
             case "create-account-create-button":
                 name: str = self.query_one("#create-account-name-input", Input).value
 
@@ -128,13 +148,19 @@ class CreateAccountScreen(Screen[Any]):
                     "#create-account-account-type-select", Select
                 ).value
 
+                currency: str = self.query_one(
+                    "#create-account-currency-select", Select
+                ).value
+
                 match type:
                     case Select.BLANK:
                         self.notify("Välj kontotyp", severity="warning")
                         return
 
                     case AccountType.CHECKING:
-                        self.app.bank.register_account(Account.new_checking(name))
+                        self.app.bank.register_account(
+                            Account.new_checking(name, currency), self.app.customer
+                        )
 
                     case AccountType.SAVINGS:
                         interest = CreateAccountScreen.validate_percentage_input(
@@ -149,7 +175,8 @@ class CreateAccountScreen(Screen[Any]):
                             return
 
                         self.app.bank.register_account(
-                            Account.new_savings(name, interest / 100.0)
+                            Account.new_savings(name, interest / 100.0, currency),
+                            self.app.customer,
                         )
 
                     case AccountType.ISK:
@@ -176,7 +203,10 @@ class CreateAccountScreen(Screen[Any]):
                             return
 
                         self.app.bank.register_account(
-                            Account.new_isk(name, return_rate / 100.0, tax / 100.0)
+                            Account.new_isk(
+                                name, return_rate / 100.0, tax / 100.0, currency
+                            ),
+                            self.app.customer,
                         )
 
                     case AccountType.AF:
@@ -203,7 +233,13 @@ class CreateAccountScreen(Screen[Any]):
                             return
 
                         self.app.bank.register_account(
-                            Account.new_af(name, return_rate / 100.0, tax / 100.0)
+                            Account.new_af(
+                                name,
+                                return_rate / 100.0,
+                                tax / 100.0,
+                                currency=currency,
+                            ),
+                            self.app.customer,
                         )
 
                 # återgå till dashboard
@@ -5,6 +5,7 @@ from textual.screen import Screen
 from typing import Any
 
 from screen.overview import OverviewScreen
+from screen.standing_order import StandingOrderScreen
 from screen.transaction import TransactionScreen, TransactionType
 
 
@@ -16,6 +17,8 @@ class DashboardScreen(Screen[Any]):
         with Center():
             content = Container(classes="content")
             content.border_title = "DecemberBanken"
+            if self.app.customer is not None:
+                content.border_subtitle = self.app.customer.name
 
             with content:
                 yield Button(
@@ -50,6 +53,14 @@ class DashboardScreen(Screen[Any]):
                     variant="default",
                 )
 
+                yield Button(
+                    "Stående överföring",
+                    id="dashboard-standing-order",
+                    classes="dashboard-button",
+                    flat=True,
+                    variant="default",
+                )
+
                 quit = Button(
                     "Logga ut",
                     id="dashboard-logout",
@@ -66,7 +77,9 @@ class DashboardScreen(Screen[Any]):
                 self.app.push_screen(OverviewScreen())
 
             case "dashboard-logout":
-                self.app.exit()
+                # tillbaka till inloggningen så att en annan kund kan väljas
+                self.app.customer = None
+                self.app.pop_screen()
 
             case "dashboard-deposit":
                 self.app.push_screen(TransactionScreen(TransactionType.DEPOSIT))
@@ -76,3 +89,6 @@ class DashboardScreen(Screen[Any]):
 
             case "dashboard-transfer":
                 self.app.push_screen(TransactionScreen(TransactionType.TRANSFER))
+
+            case "dashboard-standing-order":
+                self.app.push_screen(StandingOrderScreen())
@@ -5,6 +5,7 @@ from textual.screen import Screen
 from typing import Any
 
 from screen.dashboard import DashboardScreen
+from widget.customer_picker import CustomerPicker
 
 
 class GreetingScreen(Screen[Any]):
@@ -15,7 +16,26 @@ class GreetingScreen(Screen[Any]):
         with Center():
             yield Static("DecemberBanken ❄")
             yield Static("Din bank direkt i kommandotolken", id="greeting-subtitle")
+
+            # sökbar, så att inte en rad per kund byggs
+            self.picker = CustomerPicker(id="greeting-customer-picker")
+            self.picker.border_title = "Kund"
+            yield self.picker
+
             yield Button("Logga in", id="greeting-next", variant="primary", flat=True)
 
+    def on_mount(self) -> None:
+        # första kunden är vald från början
+        customers = self.app.bank.customers
+        if customers:
+            self.picker.value = customers[next(iter(customers))]
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
+        customer = self.picker.value
+
+        if customer is None:
+            self.notify("Välj kund", severity="warning")
+            return
+
+        self.app.customer = customer
         self.app.push_screen(DashboardScreen())
@@ -1,52 +1,257 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from rich.text import Text
+from textual import work
 from textual.app import ComposeResult
-from textual.widgets import Button, ListView, ListItem, Label
+from textual.coordinate import Coordinate
+from textual.widgets import Button, DataTable, Label
 from textual.containers import Center, Container, Horizontal
 from textual.screen import Screen
 from typing import Any
 
 from bank import Account
+from currency import BASE, format_amount
+from export import export_accounts
+from snapshot import Snapshot
 from screen.account_dashboard import AccountDashboardScreen
 from screen.create_account import CreateAccountScreen
 from screen.simulate_interest import SimulateInterestScreen
 
+COLUMNS = {"name": "Konto", "type": "Typ", "balance": "Saldo"}
+
+
+class AccountTable(DataTable):
+    """
+    kontona i en tabell, sorterad på kontonummer eller (efter klick på
+    "Saldo") på saldo i basvalutan
+
+    raderna är placeringar, inte konton. sorterat på saldo läses ordningen
+    från bankens saldoindex, så när ett saldo ändras skrivs bara raderna
+    mellan kontots gamla och nya placering om, och inget sorteras om
+
+    bara de första raderna läggs till, resten hämtas en sida i taget när man
+    scrollar mot slutet, annars byggs och mäts en rad per konto innan
+    skärmen kan visas
+    """
+
+    PAGE_SIZE = 100
+
+    def __init__(self, accounts: dict[int, Account], **kwargs):
+        super().__init__(cursor_type="row", **kwargs)
+
+        # key=kontonummer, kontona som visas
+        self.accounts = accounts
+
+        # "number" eller "balance", och störst saldo först
+        self.order = "number"
+        self.descending = True
+
+        # kontonumren i kontonummerordning
+        self.numbers = sorted(accounts)
+        # kontonumret på varje hämtad rad, och raden för varje kontonummer
+        self.shown: list[int] = []
+        self.positions: dict[int, int] = {}
+        # key=kontonummer, saldot senast det lästs, för alla konton och inte
+        # bara de hämtade raderna, används för att hålla totalen uppdaterad
+        self.balances: dict[int, float] = {}
+
+        for key, label in COLUMNS.items():
+            self.add_column(label, key=key)
+
+    def ordered(self, start: int, stop: int) -> list[int]:
+        """Kontonumren på rad start..stop i den valda ordningen."""
+        if self.order == "number":
+            return self.numbers[start:stop]
+
+        customer = self.app.customer
+        return self.app.bank.ranking_for(customer).slice(start, stop, self.descending)
+
+    def position(self, number: int) -> int:
+        """Raden som kontot ska stå på i den valda ordningen."""
+        if self.order == "number":
+            return bisect_left(self.numbers, number)
+
+        customer = self.app.customer
+        return self.app.bank.ranking_for(customer).rank(number, self.descending)
+
+    def cells(self, account: Account) -> tuple[str, str, str]:
+        return (
+            account.name,
+            account.type.value,
+            format_amount(account.balance, account.currency),
+        )
+
+    def fill(self):
+        """Fyll tabellen från början, t.ex. när ordningen byts."""
+        self.clear()
+
+        self.shown = []
+        self.positions = {}
+        self.balances = {
+            number: account.balance for number, account in self.accounts.items()
+        }
+        self.load_page()
+
+        # pilen visar vilken kolumn tabellen är sorterad på
+        sorted_by = "name" if self.order == "number" else "balance"
+        for key, label in COLUMNS.items():
+            if key == sorted_by:
+                label += " ▼" if self.descending or key == "name" else " ▲"
+            self.columns[key].label = Text(label)
+
+    def load_page(self):
+        """Hämta nästa sida rader."""
+        start = len(self.shown)
+        numbers = self.ordered(start, start + self.PAGE_SIZE)
+        if not numbers:
+            return
+
+        self.shown.extend(numbers)
+        self.positions.update(
+            (number, row) for row, number in enumerate(numbers, start)
+        )
+        self.add_rows(self.cells(self.accounts[number]) for number in numbers)
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+
+        # hämta nästa sida när man närmar sig slutet
+        if new_value >= self.max_scroll_y - self.PAGE_SIZE // 2:
+            self.load_page()
+
+    def refresh_rows(self, start: int, stop: int, changed: set[int]):
+        """Skriv om raderna start..stop där kontot flyttats eller saldot ändrats."""
+        for row, number in enumerate(self.ordered(start, stop), start):
+            account = self.accounts[number]
+            old = self.shown[row]
+
+            if old != number:
+                # kontot som stod här kan ha flyttats utanför de hämtade raderna
+                if self.positions.get(old) == row:
+                    del self.positions[old]
+
+                self.shown[row] = number
+                self.positions[number] = row
+                for column, cell in enumerate(self.cells(account)):
+                    self.update_cell_at(Coordinate(row, column), cell)
+
+            elif number in changed:
+                self.update_cell_at(
+                    Coordinate(row, 2),
+                    format_amount(account.balance, account.currency),
+                )
+
+    def apply_changes(self, pending: dict[int, tuple[Account, set[str]]]):
+        """Visa ändrade konton, bara rader vars innehåll flyttats skrivs om."""
+        start, stop = len(self.shown), 0
+        changed = set()
+
+        for number, (account, changes) in pending.items():
+            if "closed" in changes:
+                if number not in self.balances:
+                    continue
+
+                del self.numbers[bisect_left(self.numbers, number)]
+                del self.balances[number]
+
+                # konton efter de hämtade raderna syns inte
+                row = self.positions.pop(number, None)
+                if row is None:
+                    continue
+
+                # raderna efter flyttas upp en rad, den sista tas bort
+                last = self.shown.pop()
+                if self.positions.get(last) == len(self.shown):
+                    del self.positions[last]
+                self.remove_row(
+                    self.coordinate_to_cell_key(Coordinate(len(self.shown), 0)).row_key
+                )
+                start, stop = min(start, row), len(self.shown)
+
+            elif "opened" in changes:
+                # alla rader är hämtade om tabellen visade alla konton innan
+                complete = len(self.shown) == len(self.numbers)
+                insort(self.numbers, number)
+                self.balances[number] = account.balance
+
+                # en ny rad sist, raderna från kontots placering flyttas ned
+                new = self.position(number)
+                if new < len(self.shown) or complete:
+                    self.shown.append(0)
+                    self.add_row(*self.cells(account))
+                    start, stop = min(start, new), len(self.shown)
+
+            elif "balance" in changes and number in self.balances:
+                self.balances[number] = account.balance
+                changed.add(number)
+
+                # ett konto efter de hämtade raderna räknas som raden efter
+                # den sista
+                row = self.positions.get(number, len(self.shown))
+                new = min(self.position(number), len(self.shown))
+                start, stop = min(start, row, new), max(stop, row + 1, new + 1)
+
+        stop = min(stop, len(self.shown))
+        if start < stop:
+            self.refresh_rows(start, stop, changed)
+
+    def on_data_table_header_selected(self, event: DataTable.HeaderSelected):
+        event.stop()
+
+        match event.column_key.value:
+            case "balance":
+                # ett till klick vänder ordningen
+                if self.order == "balance":
+                    self.descending = not self.descending
+                self.order = "balance"
+
+            case "name":
+                self.order = "number"
 
-class AccountListItem(ListItem):
-    def __init__(self, account: Account):
-        super().__init__(classes="overview-account-list-item")
-        self.border_subtitle = account.type.value
-        self.account = account
+            case _:
+                return
 
-    def compose(self):
-        yield Label(self.account.name)
-        yield Label(f"{self.account.balance:.2f} kr")
+        self.fill()
 
-    def on_click(self):
-        self.app.push_screen(AccountDashboardScreen(self.account))
+    def on_data_table_row_selected(self, event: DataTable.RowSelected):
+        event.stop()
+        account = self.accounts[self.shown[event.cursor_row]]
+        self.app.push_screen(AccountDashboardScreen(account))
 
 
 class OverviewScreen(Screen[Any]):
     def __init__(self):
         super().__init__()
 
+        # key=kontonummer, ändringar som ännu inte visats
+        self.pending_changes: dict[int, tuple[Account, set[str]]] = {}
+
     def compose(self) -> ComposeResult:
         with Center():
             content = Container(classes="content")
             content.border_title = "Översikt"
 
             with content:
+                customer = self.app.customer
+
+                # klockan som kontona senast lästs vid
+                self.month = self.app.bank.month
+
+                # summor per valuta, räknas om till basvalutan när de visas
+                self.totals = self.app.bank.totals(customer)
+                self.total = self.app.bank.rates.convert_totals(self.totals, BASE)
                 self.total_label = Label(
-                    f"Totala tillgångar {sum(account.balance for account in self.app.bank.accounts.values()):.2f} kr",
+                    f"Totala tillgångar {format_amount(self.total)}",
                     classes="margin-bottom",
                 )
                 yield self.total_label
 
-                self.list = ListView(
-                    *(
-                        AccountListItem(account)
-                        for account in self.app.bank.accounts.values()
-                    )
+                accounts = (
+                    self.app.bank.accounts if customer is None else customer.accounts
                 )
-                yield self.list
+                self.table = AccountTable(accounts, id="overview-account-table")
+                yield self.table
 
                 yield Button(
                     "+ Nytt konto",
@@ -63,6 +268,13 @@ class OverviewScreen(Screen[Any]):
                         flat=True,
                         variant="default",
                     )
+                    yield Button(
+                        "Exportera",
+                        id="overview-export-button",
+                        classes="margin-left",
+                        flat=True,
+                        variant="default",
+                    )
                     yield Button(
                         "Simulera ränteutbetalning",
                         id="overview-simulate-interest-button",
@@ -71,15 +283,61 @@ class OverviewScreen(Screen[Any]):
                         variant="primary",
                     )
 
+    def on_mount(self) -> None:
+        self.table.fill()
+        self.app.bank.subscribe(self.account_changed)
+
+    def on_unmount(self) -> None:
+        self.app.bank.unsubscribe(self.account_changed)
+
     def on_screen_resume(self) -> None:
-        # uppdatera lista med konton
-        self.list.clear()
-        for account in self.app.bank.accounts.values():
-            self.list.append(AccountListItem(account))
+        # klockan har flyttats fram, läs kontona igen så att de som ändrats
+        # notifierar
+        if self.month != self.app.bank.month:
+            self.month = self.app.bank.month
+            for _ in self.app.bank.read_accounts(self.app.customer):
+                pass
+
+    def account_changed(self, account: Account, changes: set[str]):
+        # bara den inloggade kundens konton visas
+        customer = self.app.customer
+        if customer is not None and account.customer != customer.number:
+            return
+
+        # samla ändringar och uppdatera tabellen en gång per frame
+        if not self.pending_changes:
+            self.call_after_refresh(self.apply_changes)
+
+        self.pending_changes.setdefault(account.number, (account, set()))[1].update(
+            changes
+        )
+
+    def apply_changes(self):
+        pending = self.pending_changes
+        self.pending_changes = {}
+
+        totals = self.totals
+        # saldona som visades innan tabellen uppdateras
+        balances = self.table.balances.copy()
 
-        # uppdatera "totala tillgångar" label
-        total = sum(account.balance for account in self.app.bank.accounts.values())
-        self.total_label.update(f"Totala tillgångar {total:.2f} kr")
+        self.table.apply_changes(pending)
+
+        for number, (account, changes) in pending.items():
+            currency = account.currency
+            old = balances.get(number)
+            new = self.table.balances.get(number)
+
+            if old != new:
+                totals[currency] = (
+                    totals.get(currency, 0.0) + (new or 0.0) - (old or 0.0)
+                )
+
+        # en omräkning per valuta, och "totala tillgångar" uppdateras bara om
+        # totalen ändrats
+        total = self.app.bank.rates.convert_totals(totals, BASE)
+        if total != self.total:
+            self.total = total
+            self.total_label.update(f"Totala tillgångar {format_amount(self.total)}")
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         match event.button.id:
@@ -91,3 +349,30 @@ class OverviewScreen(Screen[Any]):
 
             case "overview-simulate-interest-button":
                 self.app.push_screen(SimulateInterestScreen())
+
+            case "overview-export-button":
+                # ögonblicksbilden tas här så att exporten visar banken som den
+                # var när knappen trycktes, även om konton ändras under tiden
+                customer = self.app.customer
+                self.export(
+                    f"konton-{datetime.now():%Y%m%d-%H%M%S}.csv.xz",
+                    self.app.bank.snapshot(),
+                    None if customer is None else sorted(customer.accounts),
+                )
+
+    @work(thread=True, exclusive=True)
+    def export(self, path: str, snapshot: Snapshot, numbers: list[int] | None):
+        # körs i en egen tråd så att gränssnittet inte fryser
+        rows = export_accounts(
+            self.app.bank,
+            path,
+            compression="lzma",
+            snapshot=snapshot,
+            numbers=numbers,
+        )
+
+        self.app.call_from_thread(
+            self.notify,
+            f"{rows} konton exporterades till {path}",
+            severity="information",
+        )
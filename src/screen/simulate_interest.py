@@ -1,14 +1,22 @@
 from textual.app import ComposeResult
-from textual.widgets import Button, Input
+from textual.widgets import Button, Input, Label
 from textual.containers import Center, Container, Horizontal
 from textual.screen import Screen
 from typing import Any
 
+from currency import BASE, format_amount
+from sandbox import Sandbox
+
 
 class SimulateInterestScreen(Screen[Any]):
     def __init__(self):
         super().__init__()
 
+        # simuleringen körs i en sandlåda och påverkar inte banken förrän
+        # den verkställs
+        self.sandbox: Sandbox | None = None
+        self.num_years = 0
+
     def compose(self) -> ComposeResult:
         with Center():
             content = Container(classes="content")
@@ -23,6 +31,10 @@ class SimulateInterestScreen(Screen[Any]):
                 num_years.border_title = "Antal år"
                 yield num_years
 
+                self.result_label = Label("", classes="margin-bottom")
+                self.result_label.display = False
+                yield self.result_label
+
                 with Horizontal():
                     yield Button(
                         "Avbryt",
@@ -31,11 +43,19 @@ class SimulateInterestScreen(Screen[Any]):
                         flat=True,
                     )
                     yield Button(
-                        "Simulera ränteutbetalning",
+                        "Simulera",
                         id="simulate-interest-create-button",
                         classes="margin-left",
+                        variant="default",
+                        flat=True,
+                    )
+                    yield Button(
+                        "Verkställ",
+                        id="simulate-interest-commit-button",
+                        classes="margin-left",
                         variant="primary",
                         flat=True,
+                        disabled=True,
                     )
 
     @staticmethod
@@ -65,11 +85,67 @@ class SimulateInterestScreen(Screen[Any]):
                     )
                     return
 
-                for _ in range(num_years):
-                    self.app.bank.apply_yearly_update()
+                self.sandbox = Sandbox(self.app.bank)
+                self.num_years = num_years
+
+                failures_before = sum(
+                    order.failures for order in self.app.bank.scheduler.orders.values()
+                )
+
+                self.sandbox.advance(12 * num_years)
+
+                failures = (
+                    sum(
+                        order.failures
+                        for order in self.sandbox.scheduler.orders.values()
+                    )
+                    - failures_before
+                )
+
+                # klockan gäller hela banken, men bara kundens tillgångar visas
+                customer = self.app.customer
+
+                before = self.app.bank.total(customer)
+
+                if self.sandbox.lazy_accrual and not self.sandbox.scheduler.orders:
+                    # utan stående överföringar kan totalen räknas fram direkt,
+                    # kontona i sandlådan behöver inte läsas och kopieras
+                    after = self.app.bank.projected_total(num_years, customer)
+                else:
+                    numbers = (
+                        list(self.sandbox.accounts)
+                        if customer is None
+                        else [
+                            number
+                            for number in customer.accounts
+                            if number in self.sandbox.accounts
+                        ]
+                    )
+
+                    totals = {}
+                    for number in numbers:
+                        account = self.sandbox.read_account(
+                            self.sandbox.accounts[number]
+                        )
+                        totals[account.currency] = (
+                            totals.get(account.currency, 0.0) + account.balance
+                        )
+
+                    after = self.app.bank.rates.convert_totals(totals, BASE)
+
+                result = f"Totala tillgångar om {num_years} år: {format_amount(after)} (idag {format_amount(before)})"
+                if failures:
+                    result += f"\n{failures} stående överföringar misslyckades"
+
+                self.result_label.update(result)
+                self.result_label.display = True
+                self.query_one("#simulate-interest-commit-button").disabled = False
+
+            case "simulate-interest-commit-button":
+                self.sandbox.commit()
 
                 self.notify(
-                    f"Simulering genomförd för {num_years} år",
+                    f"Simulering genomförd för {self.num_years} år",
                     severity="information",
                 )
 
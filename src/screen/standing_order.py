@@ -0,0 +1,103 @@
+from textual.app import ComposeResult
+from textual.widgets import Button, Input, Select
+from textual.containers import Center, Container, Horizontal
+from textual.screen import Screen
+from typing import Any
+
+from currency import format_amount
+from screen.transaction import TransactionScreen
+from widget.account_picker import AccountPicker
+
+
+class StandingOrderScreen(Screen[Any]):
+    def __init__(self):
+        super().__init__()
+
+    def compose(self) -> ComposeResult:
+        with Center():
+            content = Container(classes="content")
+            content.border_title = "Stående överföring"
+
+            with content:
+                from_picker = AccountPicker(id="standing-order-from-picker")
+                from_picker.border_title = "Från"
+                yield from_picker
+
+                to_picker = AccountPicker(id="standing-order-to-picker")
+                to_picker.border_title = "Till"
+                yield to_picker
+
+                with Container(classes="margin-top-bottom"):
+                    amount = Input(
+                        placeholder="Belopp...", id="standing-order-amount-input"
+                    )
+                    amount.border_title = "Belopp"
+                    yield amount
+
+                    interval = Select(
+                        [("Varje månad", 1), ("Varje kvartal", 3), ("Varje år", 12)],
+                        value=1,
+                        allow_blank=False,
+                        id="standing-order-interval-select",
+                        compact=True,
+                    )
+                    interval.border_title = "Intervall"
+                    yield interval
+
+                with Horizontal():
+                    yield Button(
+                        "Avbryt",
+                        id="standing-order-cancel-button",
+                        variant="error",
+                        flat=True,
+                    )
+                    yield Button(
+                        "Skapa",
+                        id="standing-order-create-button",
+                        classes="margin-left",
+                        variant="primary",
+                        flat=True,
+                    )
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        match event.button.id:
+            case "standing-order-cancel-button":
+                self.app.pop_screen()
+
+            case "standing-order-create-button":
+                account_from = self.query_one(
+                    "#standing-order-from-picker", AccountPicker
+                ).value
+                account_to = self.query_one(
+                    "#standing-order-to-picker", AccountPicker
+                ).value
+
+                if account_from is None or account_to is None:
+                    self.notify("Välj konto", severity="warning")
+                    return
+
+                if account_from == account_to:
+                    self.notify("Du kan inte överföra pengar till samma konto")
+                    return
+
+                amount = TransactionScreen.validate_amount_input(
+                    self.query_one("#standing-order-amount-input", Input).value
+                )
+
+                if not amount:
+                    self.notify("Ange ett giltigt belopp", severity="warning")
+                    return
+
+                interval = self.query_one(
+                    "#standing-order-interval-select", Select
+                ).value
+
+                self.app.bank.add_standing_order(
+                    account_from, account_to, amount, interval
+                )
+
+                self.notify(
+                    f'{format_amount(amount, account_from.currency)} överförs från "{account_from.name}" till "{account_to.name}" med start nästa månad',
+                    severity="information",
+                )
+                self.app.pop_screen()
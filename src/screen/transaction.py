@@ -1,11 +1,15 @@
 from enum import Enum, auto
+from uuid import uuid4
 from textual.app import ComposeResult
-from textual.widgets import Button, Input, Select, Label, Checkbox
+from textual.widgets import Button, Input, Label, Checkbox
 from textual.containers import Center, Container, Horizontal
 from textual.screen import Screen
 from typing import Any
 
 from bank import Account, AccountType
+from currency import UnknownCurrency, format_amount
+from velocity import LimitExceeded
+from widget.account_picker import AccountPicker
 
 
 class TransactionType(Enum):
@@ -33,6 +37,10 @@ class TransactionScreen(Screen[Any]):
         self.transfer_from = transfer_from
         self.transfer_to = transfer_to
 
+        # samma nyckel för alla försök från den här skärmen, så att ett
+        # dubbelklick inte genomför transaktionen två gånger
+        self.idempotency_key = uuid4().hex
+
     def compose(self) -> ComposeResult:
         with Center():
             content = Container(classes="content")
@@ -48,71 +56,34 @@ class TransactionScreen(Screen[Any]):
             with content:
                 match self.type:
                     case TransactionType.DEPOSIT:
-                        self.to_select = Select(
-                            [
-                                (
-                                    f"{account.name} - {account.type.value} ({account.balance:.2f} kr)",
-                                    account,
-                                )
-                                for account in self.app.bank.accounts.values()
-                            ],
-                            prompt="Välj...",
-                            id="transaction-deposit-select",
-                            compact=True,
-                        )
-                        self.to_select.border_title = "Konto"
-                        yield self.to_select
+                        self.to_picker = AccountPicker(id="transaction-deposit-picker")
+                        self.to_picker.border_title = "Konto"
+                        yield self.to_picker
 
                     case TransactionType.WITHDRAW:
-                        self.from_select = Select(
-                            [
-                                (
-                                    f"{account.name} - {account.type.value} ({account.balance:.2f} kr)",
-                                    account,
-                                )
-                                for account in self.app.bank.accounts.values()
-                            ],
-                            prompt="Välj...",
-                            id="transaction-withdraw-select",
-                            compact=True,
+                        self.from_picker = AccountPicker(
+                            id="transaction-withdraw-picker"
                         )
-                        self.from_select.border_title = "Konto"
-                        yield self.from_select
+                        self.from_picker.border_title = "Konto"
+                        yield self.from_picker
 
                     case TransactionType.TRANSFER:
-                        self.from_select = Select(
-                            [
-                                (
-                                    f"{account.name} - {account.type.value} ({account.balance:.2f} kr)",
-                                    account,
-                                )
-                                for account in self.app.bank.accounts.values()
-                            ],
-                            prompt="Välj...",
-                            id="transaction-transfer-from-select",
-                            compact=True,
+                        self.from_picker = AccountPicker(
+                            id="transaction-transfer-from-picker"
                         )
-                        self.from_select.border_title = "Från"
-                        yield self.from_select
-
-                        self.to_select = Select(
-                            [
-                                (
-                                    f"{account.name} - {account.type.value} ({account.balance:.2f} kr)",
-                                    account,
-                                )
-                                for account in self.app.bank.accounts.values()
-                            ],
-                            prompt="Välj...",
-                            id="transaction-transfer-to-select",
-                            compact=True,
+                        self.from_picker.border_title = "Från"
+                        yield self.from_picker
+
+                        self.to_picker = AccountPicker(
+                            id="transaction-transfer-to-picker"
                         )
-                        self.to_select.border_title = "Till"
-                        yield self.to_select
+                        self.to_picker.border_title = "Till"
+                        yield self.to_picker
 
                 with Container(classes="margin-top-bottom"):
-                    self.amount = Input(placeholder="Belopp (kr)...")
-                    self.amount.border_title = "Belopp kr"
+                    # beloppet är i valutan för kontot som pengarna tas från
+                    self.amount = Input(placeholder="Belopp...")
+                    self.amount.border_title = "Belopp"
                     yield self.amount
 
                     match self.type:
@@ -147,22 +118,22 @@ class TransactionScreen(Screen[Any]):
         match self.type:
             case TransactionType.DEPOSIT:
                 if self.deposit_to:
-                    self.to_select.value = self.deposit_to
-                    self.to_select.disabled = True
+                    self.to_picker.value = self.deposit_to
+                    self.to_picker.disabled = True
 
             case TransactionType.WITHDRAW:
                 if self.withdraw_from:
-                    self.from_select.value = self.withdraw_from
-                    self.from_select.disabled = True
+                    self.from_picker.value = self.withdraw_from
+                    self.from_picker.disabled = True
 
             case TransactionType.TRANSFER:
                 if self.transfer_from:
-                    self.from_select.value = self.transfer_from
-                    self.from_select.disabled = True
+                    self.from_picker.value = self.transfer_from
+                    self.from_picker.disabled = True
 
                 if self.transfer_to:
-                    self.to_select.value = self.transfer_to
-                    self.to_select.disabled = True
+                    self.to_picker.value = self.transfer_to
+                    self.to_picker.disabled = True
 
     def on_checkbox_changed(self, event: Checkbox.Changed) -> None:
         self.amount.disabled = event.value
@@ -178,6 +149,10 @@ class TransactionScreen(Screen[Any]):
             return None
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
+        # tryck som hunnit köas innan skärmen stängdes
+        if not self.is_current:
+            return
+
         match event.button.id:
             case "transaction-cancel-button":
                 self.app.pop_screen()
@@ -188,10 +163,10 @@ class TransactionScreen(Screen[Any]):
                 match self.type:
                     case TransactionType.DEPOSIT:
                         account = self.query_one(
-                            "#transaction-deposit-select", Select
+                            "#transaction-deposit-picker", AccountPicker
                         ).value
 
-                        if account == Select.BLANK:
+                        if account is None:
                             self.notify("Välj konto", severity="warning")
                             return
 
@@ -199,20 +174,20 @@ class TransactionScreen(Screen[Any]):
                             self.notify("Ange ett giltigt belopp", severity="warning")
                             return
 
-                        account.deposit(amount)
+                        self.app.bank.deposit(account, amount, self.idempotency_key)
 
                         self.notify(
-                            f'{amount:.2f} kr har satts in på "{account.name}"',
+                            f'{format_amount(amount, account.currency)} har satts in på "{account.name}"',
                             severity="information",
                         )
                         self.app.pop_screen()
 
                     case TransactionType.WITHDRAW:
                         account = self.query_one(
-                            "#transaction-withdraw-select", Select
+                            "#transaction-withdraw-picker", AccountPicker
                         ).value
 
-                        if account == Select.BLANK:
+                        if account is None:
                             self.notify("Välj konto", severity="warning")
                             return
 
@@ -223,14 +198,9 @@ class TransactionScreen(Screen[Any]):
                             )
                             return
 
-                        # hitta användarkonto
-                        checking_account = next(
-                            (
-                                account
-                                for account in self.app.bank.accounts.values()
-                                if account.type == AccountType.CHECKING
-                            ),
-                            None,
+                        # hitta kundens användarkonto
+                        checking_account = self.app.bank.checking_account(
+                            self.app.customer
                         )
 
                         if not checking_account:
@@ -244,7 +214,8 @@ class TransactionScreen(Screen[Any]):
                         if self.query_one(
                             "#transaction-withdraw-checkbox", Checkbox
                         ).value:
-                            amount = account.balance
+                            # för AF räcker resten till skatten
+                            amount = self.app.bank.read_account(account).available()
                         elif not amount:
                             self.notify("Ange ett giltigt belopp", severity="warning")
                             return
@@ -253,32 +224,40 @@ class TransactionScreen(Screen[Any]):
                             self.notify("Inget att ta ut", severity="warning")
                             return
 
-                        if not account.withdraw(amount):
-                            self.notify("Otillräckligt saldo", severity="warning")
+                        try:
+                            if not self.app.bank.transfer(
+                                account,
+                                checking_account,
+                                amount,
+                                self.idempotency_key,
+                                withdrawal=True,
+                            ):
+                                self.notify("Otillräckligt saldo", severity="warning")
+                                return
+                        except (LimitExceeded, UnknownCurrency) as error:
+                            self.notify(str(error), severity="warning")
                             return
 
-                        checking_account.deposit(amount)
-
                         self.notify(
-                            f'{amount:.2f} kr har tagits ut från "{account.name}" och satts in på "{checking_account.name}"',
+                            f'{format_amount(amount, account.currency)} har tagits ut från "{account.name}" och satts in på "{checking_account.name}"',
                             severity="information",
                         )
                         self.app.pop_screen()
 
                     case TransactionType.TRANSFER:
                         account_from = self.query_one(
-                            "#transaction-transfer-from-select", Select
+                            "#transaction-transfer-from-picker", AccountPicker
                         ).value
 
-                        if account_from == Select.BLANK:
+                        if account_from is None:
                             self.notify("Välj konto", severity="warning")
                             return
 
                         account_to = self.query_one(
-                            "#transaction-transfer-to-select", Select
+                            "#transaction-transfer-to-picker", AccountPicker
                         ).value
 
-                        if account_to == Select.BLANK:
+                        if account_to is None:
                             self.notify("Välj konto", severity="warning")
                             return
 
@@ -290,7 +269,9 @@ class TransactionScreen(Screen[Any]):
                         if self.query_one(
                             "#transaction-transfer-checkbox", Checkbox
                         ).value:
-                            amount = account_from.balance
+                            amount = self.app.bank.read_account(
+                                account_from
+                            ).available()
                         elif not amount:
                             self.notify("Ange ett giltigt belopp", severity="warning")
                             return
@@ -299,14 +280,18 @@ class TransactionScreen(Screen[Any]):
                             self.notify("Inget att överföra", severity="warning")
                             return
 
-                        if not account_from.withdraw(amount):
-                            self.notify("Otillräckligt saldo", severity="warning")
+                        try:
+                            if not self.app.bank.transfer(
+                                account_from, account_to, amount, self.idempotency_key
+                            ):
+                                self.notify("Otillräckligt saldo", severity="warning")
+                                return
+                        except (LimitExceeded, UnknownCurrency) as error:
+                            self.notify(str(error), severity="warning")
                             return
 
-                        account_to.deposit(amount)
-
                         self.notify(
-                            f'{amount:.2f} kr har överförts från "{account_from.name}" till "{account_to.name}"',
+                            f'{format_amount(amount, account_from.currency)} har överförts från "{account_from.name}" till "{account_to.name}"',
                             severity="information",
                         )
                         self.app.pop_screen()
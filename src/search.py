@@ -0,0 +1,147 @@
+from bisect import bisect_left, insort
+
+
+class SortedKeys:
+    """
+    sorterad lista uppdelad i hinkar, så att en insättning bara flyttar
+    elementen i en hink istället för hela listan
+    """
+
+    LOAD = 1000
+
+    def __init__(self):
+        self.buckets: list[list[tuple[str, int]]] = []
+        # största elementet i varje hink
+        self.maxes: list[tuple[str, int]] = []
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets)
+
+    def add(self, item: tuple[str, int]):
+        if not self.buckets:
+            self.buckets.append([item])
+            self.maxes.append(item)
+            return
+
+        i = min(bisect_left(self.maxes, item), len(self.buckets) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, item)
+        self.maxes[i] = bucket[-1]
+
+        # dela hinken när den blivit för stor
+        if len(bucket) > 2 * SortedKeys.LOAD:
+            self.buckets.insert(i + 1, bucket[SortedKeys.LOAD :])
+            del bucket[SortedKeys.LOAD :]
+            self.maxes.insert(i, bucket[-1])
+
+    def remove(self, item: tuple[str, int]):
+        i = bisect_left(self.maxes, item)
+        if i == len(self.buckets):
+            return
+
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, item)
+        if j < len(bucket) and bucket[j] == item:
+            del bucket[j]
+
+            if bucket:
+                self.maxes[i] = bucket[-1]
+            else:
+                del self.buckets[i]
+                del self.maxes[i]
+
+    def iter_from(self, item):
+        """Elementen i ordning, med början från det första som är >= item."""
+        i = bisect_left(self.maxes, item)
+
+        if i < len(self.buckets):
+            bucket = self.buckets[i]
+            yield from bucket[bisect_left(bucket, item) :]
+
+            for bucket in self.buckets[i + 1 :]:
+                yield from bucket
+
+
+class AccountIndex:
+    """
+    sökindex över kontonamn och kontonummer, används också för kunder
+    (allt med name och number)
+
+    prefixsökning görs med bisect i en sorterad lista av nycklar, och
+    delsträngssökning med trigram: varje nyckel delas upp i alla sina
+    tre-teckens delsträngar som pekar på kontonumren
+    """
+
+    def __init__(self):
+        # sorterade (nyckel, kontonummer)
+        self.keys = SortedKeys()
+        # key=trigram, value=kontonummer vars nycklar innehåller trigrammet
+        self.trigrams: dict[str, set[int]] = {}
+        # key=kontonummer, value=kontots nycklar
+        self.account_keys: dict[int, tuple[str, ...]] = {}
+
+    @staticmethod
+    def _keys(account) -> tuple[str, ...]:
+        return (
+            account.name.casefold(),
+            f"{account.number:010}",
+            str(account.number),
+        )
+
+    @staticmethod
+    def _trigrams(key: str):
+        return {key[i : i + 3] for i in range(len(key) - 2)}
+
+    def add(self, account):
+        keys = AccountIndex._keys(account)
+        self.account_keys[account.number] = keys
+
+        for key in keys:
+            self.keys.add((key, account.number))
+
+            for trigram in AccountIndex._trigrams(key):
+                self.trigrams.setdefault(trigram, set()).add(account.number)
+
+    def remove(self, account_number: int):
+        keys = self.account_keys.pop(account_number, ())
+
+        for key in keys:
+            self.keys.remove((key, account_number))
+
+            for trigram in AccountIndex._trigrams(key):
+                numbers = self.trigrams.get(trigram)
+                if numbers is not None:
+                    numbers.discard(account_number)
+                    if not numbers:
+                        del self.trigrams[trigram]
+
+    def search(self, query: str, limit: int = 10) -> list[int]:
+        """Kontonummer för de första limit träffarna, prefixträffar först."""
+        query = query.casefold().strip()
+        result: dict[int, None] = {}
+
+        # prefix
+        for key, number in self.keys.iter_from((query,)):
+            if len(result) >= limit or not key.startswith(query):
+                break
+            result[number] = None
+
+        if len(result) >= limit or len(query) < 3:
+            return list(result)
+
+        # delsträng, gå igenom den minsta mängden och verifiera
+        trigrams = AccountIndex._trigrams(query)
+        candidates = min(
+            (self.trigrams.get(trigram, set()) for trigram in trigrams), key=len
+        )
+
+        for number in candidates:
+            if number in result:
+                continue
+
+            if any(query in key for key in self.account_keys[number]):
+                result[number] = None
+                if len(result) >= limit:
+                    break
+
+        return list(result)
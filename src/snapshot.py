@@ -0,0 +1,86 @@
+from bisect import bisect_right
+
+
+class Snapshot:
+    """
+    läsvy av en bank vid en viss tidpunkt (version), för läsare som går
+    igenom många konton medan banken ändras, t.ex. exporter i en egen tråd
+
+    banken låses aldrig. innan ett konto ändras sparas en kopia av det
+    gamla tillståndet om någon öppen ögonblicksbild behöver det, och
+    kopiorna rensas bort när ögonblicksbilderna stängts, se Bank.snapshot
+
+    skapas och ska stängas med close(), eller användas med with
+    """
+
+    def __init__(self, bank, version: int, month: int, account_number: int):
+        self.bank = bank
+        self.version = version
+        self.month = month
+        # konton med nummer från och med detta fanns inte när bilden togs
+        self.account_number = account_number
+
+        self.closed = False
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        # banken städar i den tråd som ändrar konton, här räcker det att
+        # säga till att versionen inte behövs längre
+        if not self.closed:
+            self.closed = True
+            self.bank.released.append(self.version)
+
+    def read(self, number: int):
+        """Kontot som det såg ut när bilden togs, None om det inte fanns.
+
+        Kontot är en kopia, ändringar i den påverkar inte banken.
+        """
+        bank = self.bank
+
+        while True:
+            account = bank.accounts.get(number)
+            version = account.version if account is not None else None
+
+            if version is None or version > self.version:
+                old = self._old(number)
+                if old is None:
+                    return None
+
+                view = old.copy()
+                break
+
+            view = account.copy()
+
+            # kontot har inte börjat ändras under tiden
+            if account.version == version:
+                break
+
+        if bank.lazy_accrual and view.accrued_month < self.month:
+            view.accrue_to(self.month)
+
+        return view
+
+    def _old(self, number: int):
+        # sparade tillstånd i versionsordning, det sista som inte är nyare
+        # än bilden gäller
+        chain = self.bank.versions.get(number, ())
+        i = bisect_right(chain, self.version, key=lambda entry: entry[0])
+        return chain[i - 1][1] if i else None
+
+    def accounts(self, numbers=None):
+        """Kontona i kontonummerordning, eller bara de med nummer i numbers."""
+        if numbers is None:
+            numbers = range(1, self.account_number)
+
+        for number in numbers:
+            account = self.read(number)
+            if account is not None:
+                yield account
+
+    def total(self, numbers=None) -> float:
+        return sum(account.balance for account in self.accounts(numbers))
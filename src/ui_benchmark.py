@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from importlib.metadata import version
+
+from bank_app import BankApp
+from screen.account_dashboard import AccountDashboardScreen
+from screen.overview import OverviewScreen
+from screen.transaction import TransactionScreen, TransactionType
+from workload import Workload
+
+# längsta tillåtna mediantid i sekunder per scenario
+BUDGETS = {
+    "overview_push": 0.5,
+    "overview_resume": 0.25,
+    "transfer_open": 0.5,
+    "dashboard_refresh": 0.1,
+}
+
+# huvudversionen av Textual som App._display är kontrollerad mot
+TEXTUAL_MAJOR = 8
+
+
+class BenchmarkApp(BankApp):
+    """
+    BankApp med N genererade konton, som räknar antal ritade frames
+
+    frames räknas i App._display, som inte är en del av Textuals publika
+    API. run_benchmark avbryter med andra huvudversioner av Textual än
+    TEXTUAL_MAJOR, och om den aldrig anropas, annars skulle alla scenarier
+    visa 0 frames utan att något märks
+    """
+
+    def __init__(self, accounts: int, seed: int = 0):
+        super().__init__()
+
+        self.bank = Workload(accounts=accounts, seed=seed, ledger=True).setup()
+        self.customer = self.bank.customers[1]
+        self.frames = 0
+
+    def _display(self, screen, renderable):
+        if renderable is not None:
+            self.frames += 1
+        super()._display(screen, renderable)
+
+
+class Measurement:
+    """Väggtid och antal frames från start() till stop()."""
+
+    def __init__(self, app: BenchmarkApp):
+        self.app = app
+
+    def start(self):
+        self.frames = self.app.frames
+        self.started = time.perf_counter()
+
+    async def stop(self, pilot) -> tuple[float, int]:
+        # vänta tills appen är klar med meddelanden och har ritat om
+        await pilot.pause()
+        await pilot.wait_for_scheduled_animations()
+        return time.perf_counter() - self.started, self.app.frames - self.frames
+
+
+async def overview_push(app, pilot, measurement):
+    measurement.start()
+    await app.push_screen(OverviewScreen())
+    result = await measurement.stop(pilot)
+
+    app.pop_screen()
+    await pilot.pause()
+    return result
+
+
+async def overview_resume(app, pilot, measurement):
+    await app.push_screen(OverviewScreen())
+    await pilot.pause()
+
+    account = app.bank.accounts[1]
+    screen = TransactionScreen(TransactionType.DEPOSIT, deposit_to=account)
+    await app.push_screen(screen)
+    await pilot.pause()
+    screen.amount.value = "100"
+    await pilot.pause()
+
+    # insättningen stänger skärmen och översikten visas igen
+    measurement.start()
+    screen.query_one("#transaction-confirm-button").press()
+    result = await measurement.stop(pilot)
+
+    app.pop_screen()
+    await pilot.pause()
+    return result
+
+
+async def transfer_open(app, pilot, measurement):
+    measurement.start()
+    await app.push_screen(TransactionScreen(TransactionType.TRANSFER))
+    result = await measurement.stop(pilot)
+
+    app.pop_screen()
+    await pilot.pause()
+    return result
+
+
+async def dashboard_refresh(app, pilot, measurement):
+    account = app.bank.accounts[1]
+    await app.push_screen(AccountDashboardScreen(account))
+    await pilot.pause()
+
+    # en ändring från banken uppdaterar skärmen
+    measurement.start()
+    app.bank.deposit(account, 100.0)
+    result = await measurement.stop(pilot)
+
+    app.pop_screen()
+    await pilot.pause()
+    return result
+
+
+SCENARIOS = {
+    "overview_push": overview_push,
+    "overview_resume": overview_resume,
+    "transfer_open": transfer_open,
+    "dashboard_refresh": dashboard_refresh,
+}
+
+
+async def run_benchmark(
+    accounts: int = 1000,
+    repeat: int = 5,
+    budgets: dict[str, float] | None = None,
+    seed: int = 0,
+    size: tuple[int, int] = (120, 40),
+) -> dict:
+    """Kör varje scenario repeat gånger och jämför mediantiden med budgeten."""
+    budgets = {**BUDGETS, **(budgets or {})}
+    app = BenchmarkApp(accounts, seed)
+    results = {}
+
+    async with app.run_test(size=size) as pilot:
+        await pilot.pause()
+
+        # första skärmen är ritad, så _display ska ha anropats
+        textual = version("textual")
+        if int(textual.split(".")[0]) != TEXTUAL_MAJOR:
+            raise RuntimeError(
+                f"Textual {textual} stöds inte, frames räknas i App._display "
+                f"som bara är kontrollerad mot version {TEXTUAL_MAJOR}"
+            )
+        if app.frames == 0:
+            raise RuntimeError(
+                "Inga frames räknades, App._display anropas inte av den här "
+                "versionen av Textual"
+            )
+
+        measurement = Measurement(app)
+
+        for name, scenario in SCENARIOS.items():
+            times, frames = [], []
+
+            for _ in range(repeat):
+                elapsed, count = await scenario(app, pilot, measurement)
+                times.append(elapsed)
+                frames.append(count)
+
+            median = statistics.median(times)
+            results[name] = {
+                "median": median,
+                "min": min(times),
+                "max": max(times),
+                "frames": statistics.median(frames),
+                "budget": budgets[name],
+                "passed": median <= budgets[name],
+            }
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mät skärmarnas svarstider")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        help='t.ex. "overview_push=1.5", kan anges flera gånger',
+    )
+    args = parser.parse_args()
+
+    budgets = {}
+    for budget in args.budget:
+        name, _, seconds = budget.partition("=")
+        if name not in SCENARIOS:
+            parser.error(f"okänt scenario: {name}")
+        budgets[name] = float(seconds)
+
+    results = asyncio.run(run_benchmark(args.accounts, args.repeat, budgets, args.seed))
+
+    print(f"{'scenario':<20}{'median':>10}{'min':>10}{'max':>10}{'frames':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<20}{result['median'] * 1000:>8.1f}ms"
+            f"{result['min'] * 1000:>8.1f}ms{result['max'] * 1000:>8.1f}ms"
+            f"{result['frames']:>8.0f}"
+            + ("" if result["passed"] else f"  över budget ({result['budget']} s)")
+        )
+
+    # avsluta med felkod om något scenario gick över sin budget
+    sys.exit(0 if all(result["passed"] for result in results.values()) else 1)
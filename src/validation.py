@@ -0,0 +1,8 @@
+def validate_percentage_input(input: str) -> float | None:
+    try:
+        percentage = float(input)
+        if percentage < 0.0:
+            return None
+        return percentage
+    except ValueError:
+        return None
@@ -0,0 +1,100 @@
+from array import array
+
+from currency import BASE, format_amount
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+class LimitExceeded(Exception):
+    """En transaktion skulle gå över en gräns, meddelandet kan visas för användaren."""
+
+
+class SlidingWindow:
+    """
+    summa över de senaste window sekunderna, i en ringbuffert av hinkar
+
+    varje hink täcker window / buckets sekunder. gamla hinkar nollställs när
+    tiden går framåt, så en uppdatering kostar O(1) och minnet beror bara på
+    antal hinkar. den äldsta hinken räknas med hela tiden tills den går ut,
+    så fönstret är som mest en hink för långt
+    """
+
+    def __init__(self, window: float, buckets: int):
+        self.width = window / buckets
+
+        self.sums = array("d", [0.0] * buckets)
+        self.total = 0.0
+
+        # senaste hinken som används
+        self.newest = 0
+
+    def _advance(self, now: float):
+        bucket = int(now // self.width)
+        if bucket <= self.newest:
+            return
+
+        # nollställ hinkarna mellan den senaste och nu, som mest alla
+        size = len(self.sums)
+        for old in range(max(self.newest + 1, bucket - size + 1), bucket + 1):
+            i = old % size
+            self.total -= self.sums[i]
+            self.sums[i] = 0.0
+
+        self.newest = bucket
+
+        # undvik att avrundningsfel blir kvar när fönstret är tomt
+        if self.total < 1e-9:
+            self.total = 0.0
+
+    def sum(self, now: float) -> float:
+        self._advance(now)
+        return self.total
+
+    def add(self, now: float, amount: float):
+        self._advance(now)
+        self.sums[self.newest % len(self.sums)] += amount
+        self.total += amount
+
+
+class VelocityLimit:
+    """Gränser för hur mycket som får tas ut per dygn och hur många överföringar per timme."""
+
+    def __init__(
+        self,
+        max_withdrawn: float | None = None,
+        max_transfers: int | None = None,
+        currency: str = BASE,
+    ):
+        self.max_withdrawn = max_withdrawn
+        self.max_transfers = max_transfers
+        # valutan för max_withdrawn, samma som kontots
+        self.currency = currency
+
+        # fönster skapas bara för gränser som är satta
+        self.withdrawn = SlidingWindow(DAY, 96) if max_withdrawn is not None else None
+        self.transfers = SlidingWindow(HOUR, 60) if max_transfers is not None else None
+
+    def check(self, now: float, amount: float, transfer: bool):
+        """Kastar LimitExceeded om ett uttag (eller en överföring) av amount inte tillåts."""
+        if (
+            self.withdrawn is not None
+            and self.withdrawn.sum(now) + amount > self.max_withdrawn
+        ):
+            raise LimitExceeded(
+                f"Högst {format_amount(self.max_withdrawn, self.currency)} får tas ut per dygn"
+            )
+
+        if (
+            transfer
+            and self.transfers is not None
+            and self.transfers.sum(now) + 1 > self.max_transfers
+        ):
+            raise LimitExceeded(f"Högst {self.max_transfers} överföringar per timme")
+
+    def add(self, now: float, amount: float, transfer: bool):
+        if self.withdrawn is not None:
+            self.withdrawn.add(now, amount)
+
+        if transfer and self.transfers is not None:
+            self.transfers.add(now, 1)
@@ -0,0 +1,29 @@
+from bank import Account
+from currency import format_amount
+from widget.search_picker import SearchPicker
+
+
+class AccountPicker(SearchPicker):
+    """
+    sökbar kontoväljare
+
+    söker i den inloggade kundens index om det finns en, annars i bankens
+    """
+
+    PLACEHOLDER = "Sök konto..."
+
+    class Changed(SearchPicker.Changed):
+        pass
+
+    @staticmethod
+    def label(account: Account) -> str:
+        return f"{account.name} - {account.type.value} ({format_amount(account.balance, account.currency)})"
+
+    def search(self, query: str, limit: int) -> list[int]:
+        customer = self.app.customer
+        index = self.app.bank.index if customer is None else customer.index
+        return index.search(query, limit)
+
+    def lookup(self, number: int) -> Account:
+        bank = self.app.bank
+        return bank.read_account(bank.accounts[number])
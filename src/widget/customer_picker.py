@@ -0,0 +1,21 @@
+from bank import Customer
+from widget.search_picker import SearchPicker
+
+
+class CustomerPicker(SearchPicker):
+    """sökbar kundväljare över bankens kundindex"""
+
+    PLACEHOLDER = "Sök kund..."
+
+    class Changed(SearchPicker.Changed):
+        pass
+
+    @staticmethod
+    def label(customer: Customer) -> str:
+        return f"{customer.name} ({customer.number})"
+
+    def search(self, query: str, limit: int) -> list[int]:
+        return self.app.bank.customer_index.search(query, limit)
+
+    def lookup(self, number: int) -> Customer:
+        return self.app.bank.customers[number]
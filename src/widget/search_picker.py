@@ -0,0 +1,105 @@
+from textual import on
+from textual.app import ComposeResult
+from textual.message import Message
+from textual.widget import Widget
+from textual.widgets import Input, OptionList
+from textual.widgets.option_list import Option
+
+
+class SearchPicker(Widget):
+    """
+    sökbar väljare, ersätter Select som måste bygga en rad per val
+
+    bara de bästa träffarna från ett sökindex visas. underklasser anger
+    indexet med search, texten för ett val med label och valet för ett
+    nummer med lookup
+    """
+
+    LIMIT = 8
+    PLACEHOLDER = "Sök..."
+
+    class Changed(Message):
+        def __init__(self, picker: "SearchPicker", value):
+            super().__init__()
+            self.picker = picker
+            self.value = value
+
+        @property
+        def control(self) -> "SearchPicker":
+            return self.picker
+
+    def __init__(self, id: str | None = None, classes: str | None = None):
+        super().__init__(id=id, classes=classes)
+        self._value = None
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """Numren för de första limit träffarna på query."""
+        raise NotImplementedError
+
+    def label(self, value) -> str:
+        raise NotImplementedError
+
+    def lookup(self, number: int):
+        raise NotImplementedError
+
+    def compose(self) -> ComposeResult:
+        self.input = Input(placeholder=self.PLACEHOLDER, compact=True)
+        yield self.input
+
+        self.options = OptionList(markup=False, compact=True)
+        yield self.options
+
+    def on_mount(self):
+        if self._value is None:
+            self.update_options("")
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+        # visa valet i sökfältet utan att göra en ny sökning
+        with self.input.prevent(Input.Changed):
+            self.input.value = self.label(value) if value is not None else ""
+
+        self.set_class(value is not None, "-selected")
+        self.post_message(self.Changed(self, value))
+
+    def update_options(self, query: str):
+        self.options.clear_options()
+        self.options.add_options(
+            Option(self.label(self.lookup(number)), id=str(number))
+            for number in self.search(query, self.LIMIT)
+        )
+
+    @on(Input.Changed)
+    def input_changed(self, event: Input.Changed) -> None:
+        event.stop()
+
+        # ändrad text betyder att det tidigare valet inte längre gäller
+        if self._value is not None:
+            self._value = None
+            self.remove_class("-selected")
+            self.post_message(self.Changed(self, None))
+
+        self.update_options(event.value)
+
+    @on(Input.Submitted)
+    def input_submitted(self, event: Input.Submitted) -> None:
+        event.stop()
+
+        # enter väljer den markerade (eller första) träffen
+        index = self.options.highlighted or 0
+        if index < self.options.option_count:
+            self.select(self.options.get_option_at_index(index))
+
+    @on(OptionList.OptionSelected)
+    def option_selected(self, event: OptionList.OptionSelected) -> None:
+        event.stop()
+        self.select(event.option)
+
+    def select(self, option: Option):
+        self.value = self.lookup(int(option.id))
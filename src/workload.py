@@ -0,0 +1,336 @@
+import argparse
+from array import array
+import json
+import random
+import time
+
+from bank import Account, AccountType, Bank, Customer
+from compaction import Compactor
+from ledger import Ledger
+
+# operationer som kan köras, med standardfördelning
+OPERATIONS = {
+    "deposit": 40,
+    "withdraw": 30,
+    "transfer": 29,
+    "yearly_update": 1,
+}
+
+ACCOUNT_MIX = {
+    AccountType.CHECKING: 4,
+    AccountType.SAVINGS: 3,
+    AccountType.ISK: 2,
+    AccountType.AF: 1,
+}
+
+
+def new_account(type: AccountType, name: str) -> Account:
+    # samma villkor som exempelkontona i appen
+    match type:
+        case AccountType.CHECKING:
+            return Account.new_checking(name)
+        case AccountType.SAVINGS:
+            return Account.new_savings(name, 0.02)
+        case AccountType.ISK:
+            return Account.new_isk(name, 0.06, 0.0125)
+        case AccountType.AF:
+            return Account.new_af(name, 0.05, 0.3)
+
+
+class LatencyReport:
+    """Svarstider i sekunder per operation, och total tid för körningen."""
+
+    PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99, "p999": 0.999}
+
+    def __init__(self, config: dict):
+        self.config = config
+
+        # key=operation
+        self.latencies: dict[str, array] = {}
+        self.elapsed = 0.0
+
+    def add(self, operation: str, latency: float):
+        self.latencies.setdefault(operation, array("d")).append(latency)
+
+    @staticmethod
+    def percentile(latencies: list[float], p: float) -> float:
+        # närmaste rang, latencies ska vara sorterad
+        return latencies[max(0, min(len(latencies) - 1, int(p * len(latencies))))]
+
+    def summary(self) -> dict:
+        operations = {}
+
+        for operation, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+
+            operations[operation] = {
+                "count": len(latencies),
+                "mean": sum(latencies) / len(latencies),
+                **{
+                    name: LatencyReport.percentile(latencies, p)
+                    for name, p in LatencyReport.PERCENTILES.items()
+                },
+                "max": latencies[-1],
+            }
+
+        count = sum(len(latencies) for latencies in self.latencies.values())
+
+        return {
+            "config": self.config,
+            "operations": count,
+            "elapsed": self.elapsed,
+            "throughput": count / self.elapsed if self.elapsed else 0.0,
+            "latency": operations,
+        }
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def format(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{summary['operations']} operationer på {summary['elapsed']:.2f} s "
+            f"({summary['throughput']:.0f} op/s)",
+            f"{'operation':<14}{'antal':>9}"
+            + "".join(f"{name:>10}" for name in LatencyReport.PERCENTILES)
+            + f"{'max':>10}",
+        ]
+
+        # svarstider i mikrosekunder
+        for operation, stats in summary["latency"].items():
+            lines.append(
+                f"{operation:<14}{stats['count']:>9}"
+                + "".join(
+                    f"{stats[name] * 1e6:>10.1f}" for name in LatencyReport.PERCENTILES
+                )
+                + f"{stats['max'] * 1e6:>10.1f}"
+            )
+
+        return "\n".join(lines)
+
+
+class Workload:
+    """
+    syntetisk last mot en Bank: skapar konton och kör en blandning av
+    operationer, och mäter svarstiden för varje operation
+
+    med samma seed skapas samma konton och samma följd av operationer.
+    med rate körs operationerna med ett fast antal per sekund, och
+    svarstiden räknas från när operationen skulle ha startat så att en
+    långsam operation även syns i väntetiden för de som kommer efter
+    """
+
+    def __init__(
+        self,
+        accounts: int = 1000,
+        customers: int = 1,
+        account_mix: dict[AccountType, float] | None = None,
+        balance: tuple[float, float] = (0.0, 100_000.0),
+        operations: dict[str, float] | None = None,
+        amount: tuple[float, float] = (1.0, 1000.0),
+        rate: float | None = None,
+        seed: int = 0,
+        lazy_accrual: bool = True,
+        ledger: bool = False,
+        compaction: bool = False,
+    ):
+        self.accounts = accounts
+        self.customers = customers
+        self.account_mix = account_mix or ACCOUNT_MIX
+        self.balance = balance
+        self.operations = operations or OPERATIONS
+        self.amount = amount
+        self.rate = rate
+        self.seed = seed
+        self.lazy_accrual = lazy_accrual
+        self.ledger = ledger
+        # packa huvudbokens segment i en egen tråd medan operationerna körs
+        self.compaction = compaction
+
+        for operation in self.operations:
+            if operation not in OPERATIONS:
+                raise ValueError(f"Okänd operation: {operation}")
+
+    def config(self) -> dict:
+        return {
+            "accounts": self.accounts,
+            "customers": self.customers,
+            "account_mix": {
+                type.name: weight for type, weight in self.account_mix.items()
+            },
+            "balance": list(self.balance),
+            "operations": self.operations,
+            "amount": list(self.amount),
+            "rate": self.rate,
+            "seed": self.seed,
+            "lazy_accrual": self.lazy_accrual,
+            "ledger": self.ledger,
+            "compaction": self.compaction,
+        }
+
+    def setup(self) -> Bank:
+        rng = random.Random(self.seed)
+        bank = Bank(
+            ledger=Ledger() if self.ledger else None,
+            lazy_accrual=self.lazy_accrual,
+        )
+
+        types = rng.choices(
+            list(self.account_mix),
+            weights=list(self.account_mix.values()),
+            k=self.accounts,
+        )
+        accounts = [new_account(type, f"Konto {i}") for i, type in enumerate(types, 1)]
+
+        # kontona fördelas slumpmässigt på kunderna
+        customers = [Customer(f"Kund {i}") for i in range(1, self.customers + 1)]
+        owned = {customer: [] for customer in customers}
+        for account in accounts:
+            owned[rng.choice(customers)].append(account)
+
+        for customer, owned_accounts in owned.items():
+            bank.register_customer(customer)
+            bank.register_accounts(owned_accounts, customer)
+
+        accounts = list(bank.accounts.values())
+
+        low, high = self.balance
+        for account in accounts:
+            bank.deposit(account, rng.uniform(low, high))
+
+        return bank
+
+    def run(self, count: int, bank: Bank | None = None) -> LatencyReport:
+        """Kör count operationer, mot bank eller en ny bank från setup."""
+        if bank is None:
+            bank = self.setup()
+
+        # egen följd för operationerna, så att de blir desamma med en annan bank
+        rng = random.Random(f"{self.seed}:operations")
+
+        accounts = list(bank.accounts.values())
+        report = LatencyReport(self.config())
+
+        operations = rng.choices(
+            list(self.operations), weights=list(self.operations.values()), k=count
+        )
+        low, high = self.amount
+
+        compactor = None
+        if self.compaction and bank.ledger is not None:
+            compactor = Compactor(bank.ledger, interval=0.1)
+            compactor.start()
+
+        started = time.perf_counter()
+
+        for i, operation in enumerate(operations):
+            account = rng.choice(accounts)
+            amount = rng.uniform(low, high)
+            if operation == "transfer":
+                other = rng.choice(accounts)
+
+            if self.rate:
+                # vänta till operationens planerade start
+                scheduled = started + i / self.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+
+            match operation:
+                case "deposit":
+                    bank.deposit(account, amount)
+                case "withdraw":
+                    bank.withdraw(account, amount)
+                case "transfer":
+                    bank.transfer(account, other, amount)
+                case "yearly_update":
+                    # ett år av simulerad tid, med kvartal och stående överföringar
+                    bank.advance(12)
+
+            report.add(operation, time.perf_counter() - scheduled)
+
+        report.elapsed = time.perf_counter() - started
+
+        if compactor is not None:
+            compactor.stop()
+
+        return report
+
+
+def parse_mix(text: str, keys) -> dict:
+    """Vikter på formen "namn=vikt,namn=vikt"."""
+    mix = {}
+
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        key = keys(name.strip())
+        mix[key] = float(weight)
+
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Syntetisk last mot banken")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=1)
+    parser.add_argument("--operations", type=int, default=100_000)
+    parser.add_argument(
+        "--account-mix",
+        help='t.ex. "checking=4,savings=3,isk=2,af=1"',
+    )
+    parser.add_argument(
+        "--operation-mix",
+        help='t.ex. "deposit=40,withdraw=30,transfer=29,yearly_update=1"',
+    )
+    parser.add_argument("--min-balance", type=float, default=0.0)
+    parser.add_argument("--max-balance", type=float, default=100_000.0)
+    parser.add_argument("--rate", type=float, help="operationer per sekund")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--eager", action="store_true", help="utan lazy_accrual")
+    parser.add_argument("--ledger", action="store_true", help="med huvudbok")
+    parser.add_argument(
+        "--compaction", action="store_true", help="packa huvudboken under körningen"
+    )
+    parser.add_argument("--json", help="skriv resultatet till en JSON-fil")
+    parser.add_argument(
+        "--verify", action="store_true", help="kontrollera saldona efter körningen"
+    )
+    args = parser.parse_args()
+
+    workload = Workload(
+        accounts=args.accounts,
+        customers=args.customers,
+        account_mix=(
+            parse_mix(args.account_mix, lambda name: AccountType[name.upper()])
+            if args.account_mix
+            else None
+        ),
+        balance=(args.min_balance, args.max_balance),
+        operations=(parse_mix(args.operation_mix, str) if args.operation_mix else None),
+        rate=args.rate,
+        seed=args.seed,
+        lazy_accrual=not args.eager,
+        ledger=args.ledger,
+        compaction=args.compaction,
+    )
+    bank = workload.setup()
+    report = workload.run(args.operations, bank)
+
+    print(report.format())
+    if args.json:
+        report.write_json(args.json)
+
+    if args.verify:
+        # kastar IntegrityError om pengar skapats eller försvunnit
+        started = time.perf_counter()
+        bank.verify()
+        ranges = bank.audit()
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if ranges:
+            print(f"Konton ändrade utanför banken: {ranges}")
+        else:
+            print(f"Saldona stämmer ({elapsed:.1f} ms)")